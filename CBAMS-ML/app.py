@@ -1,10 +1,14 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import numpy as np
 import pandas as pd
 import pickle
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import json
 import os
+import atexit
 from werkzeug.utils import secure_filename
 
 # Import models
@@ -13,39 +17,228 @@ from models.crop_health_analyzer import CropHealthAnalyzer
 from models.disease_detector import DiseaseDetector
 from models.yield_predictor import YieldPredictor
 from models.price_predictor import PricePredictor
+from models.model_loader import LazyModel, ModelWatcher, warm_up_all
+from models.model_store import artifact_paths
+from models.cnn_backends import tflite_path_for
+from models.worker_pool import AnalysisPool
+from models.result_cache import ResultCache, content_hash
+from models import metrics
+from models.metrics import stage
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """jsonify() with its serialization time recorded as the 'serialize' stage"""
+
+    def dumps(self, obj, **kwargs):
+        with stage('serialize'):
+            return super().dumps(obj, **kwargs)
 
 app = Flask(__name__)
-CORS(app)
+app.json = TimedJSONProvider(app)
+CORS(app, expose_headers=['X-Timing'])
 
 # Configuration
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB
+app.config['WARMUP_MODELS'] = os.environ.get('ML_WARMUP_MODELS', 'true').lower() in ('1', 'true', 'yes')
+app.config['PERSIST_UPLOADS'] = os.environ.get('ML_PERSIST_UPLOADS', 'true').lower() in ('1', 'true', 'yes')
+# Image analysis resolution (longest side in px) and strip height for tiled analysis; 0 = off
+app.config['ANALYSIS_MAX_SIDE'] = int(os.environ.get('ML_ANALYSIS_MAX_SIDE', 0)) or None
+app.config['ANALYSIS_TILE_ROWS'] = int(os.environ.get('ML_ANALYSIS_TILE_ROWS', 0)) or None
+# Optional custom CNN (Tier 1B) and its micro-batching: max images per batch / max wait
+app.config['DISEASE_MODEL_PATH'] = os.environ.get('ML_DISEASE_MODEL_PATH')
+app.config['CNN_BATCH_SIZE'] = int(os.environ.get('ML_CNN_BATCH_SIZE', 8))
+app.config['CNN_BATCH_WINDOW_MS'] = float(os.environ.get('ML_CNN_BATCH_WINDOW_MS', 5))
+# CNN backend: 'keras' (full TensorFlow) or 'tflite' (converted model next to the Keras file,
+# see convert_cnn.py), and TFLite interpreter threads (0 = interpreter default)
+app.config['CNN_BACKEND'] = os.environ.get('ML_CNN_BACKEND', 'keras')
+app.config['CNN_THREADS'] = int(os.environ.get('ML_CNN_THREADS', 0)) or None
+# Disease cascade: screen a thumbnail (longest side in px) and skip the contour/Laplacian/CNN
+# stages for clearly healthy leaves; limits as JSON, e.g. {"brown": 1.5, "dark": 0.3}
+app.config['CASCADE'] = os.environ.get('ML_CASCADE', 'false').lower() in ('1', 'true', 'yes')
+app.config['CASCADE_SIDE'] = int(os.environ.get('ML_CASCADE_SIDE', 256))
+app.config['CASCADE_THRESHOLDS'] = json.loads(os.environ.get('ML_CASCADE_THRESHOLDS', '{}'))
+# Price forecast cache lifetime (seconds) and RNG seed
+app.config['PRICE_CACHE_TTL'] = float(os.environ.get('ML_PRICE_CACHE_TTL', 900))
+app.config['PRICE_SEED'] = int(os.environ.get('ML_PRICE_SEED', 42))
+app.config['PRICE_CACHE_ENTRIES'] = int(os.environ.get('ML_PRICE_CACHE_ENTRIES', 4096))
+# Image analysis result cache (keyed by upload content hash)
+app.config['RESULT_CACHE_ENTRIES'] = int(os.environ.get('ML_RESULT_CACHE_ENTRIES', 10000))
+app.config['RESULT_CACHE_MB'] = float(os.environ.get('ML_RESULT_CACHE_MB', 64))
+# Memoized forest predictions on quantized inputs (0 disables)
+app.config['PREDICTION_CACHE_SIZE'] = int(os.environ.get('ML_PREDICTION_CACHE_SIZE', 4096))
+# Forest backend: 'sklearn' (joblib, a private copy per worker), 'flat' (mmap'd node arrays shared across workers)
+# or 'hybrid' (flat engine for small batches, sklearn for large)
+app.config['FOREST_BACKEND'] = os.environ.get('ML_FOREST_BACKEND', 'sklearn')
+# Seconds between checks of trained_models/ (and the CNN file) for new versions; 0 disables hot reload
+app.config['MODEL_POLL_SECONDS'] = float(os.environ.get('ML_MODEL_POLL_SECONDS', 5))
+# Heuristic image analysis in worker processes (0 = in the request thread, 'auto' = one per core)
+# and OpenCV threads per worker (0 = cores divided by processes, to avoid oversubscription)
+analysis_processes = os.environ.get('ML_ANALYSIS_PROCESSES', '0')
+app.config['ANALYSIS_PROCESSES'] = os.cpu_count() if analysis_processes == 'auto' else int(analysis_processes)
+app.config['OPENCV_THREADS'] = int(os.environ.get('ML_OPENCV_THREADS', 0)) or max(
+    1, (os.cpu_count() or 1) // max(1, app.config['ANALYSIS_PROCESSES'])
+)
+# Longest wait for one worker-process analysis (seconds, 0 = no limit)
+app.config['ANALYSIS_TIMEOUT'] = float(os.environ.get('ML_ANALYSIS_TIMEOUT', 60)) or None
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs('trained_models', exist_ok=True)
 
 # Initialize models
-print("🚀 Initializing ML models...")
-crop_recommender = CropRecommendationModel()
-health_analyzer = CropHealthAnalyzer()
-disease_detector = DiseaseDetector()
-yield_predictor = YieldPredictor()
-price_predictor = PricePredictor()
-print("✅ Models loaded successfully!")
+# Heavy models (forest training/unpickling, TensorFlow) load lazily on first use,
+# or in parallel background threads when warm-up is enabled
+analysis_options = {
+    'analysis_max_side': app.config['ANALYSIS_MAX_SIDE'],
+    'tile_rows': app.config['ANALYSIS_TILE_ROWS']
+}
+analysis_pool = None
+if app.config['ANALYSIS_PROCESSES'] > 0:
+    print(f"⚙️  Starting {app.config['ANALYSIS_PROCESSES']} analysis worker processes "
+          f"({app.config['OPENCV_THREADS']} OpenCV threads each)...")
+    # Started before any server or warm-up threads exist
+    analysis_pool = AnalysisPool(
+        app.config['ANALYSIS_PROCESSES'], app.config['OPENCV_THREADS'],
+        task_timeout=app.config['ANALYSIS_TIMEOUT'], **analysis_options
+    )
+    analysis_pool.warm_up()
+    atexit.register(analysis_pool.shutdown)
+def forest_artifacts(base_path):
+    """Files whose replacement means a new forest version (joblib + flat export marker)"""
+    paths = artifact_paths(base_path)
+    return [paths['joblib'], os.path.join(paths['flat'], 'meta.json')]
+
+def cnn_artifacts(model_path, backend):
+    """CNN files whose replacement means a new detector version"""
+    if not model_path:
+        return []
+    if backend == 'tflite' and not model_path.endswith('.tflite'):
+        return [model_path, tflite_path_for(model_path)]
+    return [model_path]
+
+crop_recommender = LazyModel('crop_recommender', lambda: CropRecommendationModel(
+    app.config['FOREST_BACKEND'], cache_size=app.config['PREDICTION_CACHE_SIZE']
+), watch_paths=forest_artifacts(CropRecommendationModel.MODEL_PATH))
+disease_detector = LazyModel('disease_detector', lambda: DiseaseDetector(
+    app.config['DISEASE_MODEL_PATH'],
+    cnn_batch_size=app.config['CNN_BATCH_SIZE'],
+    cnn_batch_window_ms=app.config['CNN_BATCH_WINDOW_MS'],
+    analysis_pool=analysis_pool,
+    cnn_backend=app.config['CNN_BACKEND'],
+    cnn_threads=app.config['CNN_THREADS'],
+    cascade=app.config['CASCADE'],
+    cascade_side=app.config['CASCADE_SIDE'],
+    cascade_thresholds=app.config['CASCADE_THRESHOLDS'],
+    **analysis_options
+), watch_paths=cnn_artifacts(app.config['DISEASE_MODEL_PATH'], app.config['CNN_BACKEND']))
+yield_predictor = LazyModel('yield_predictor', lambda: YieldPredictor(
+    app.config['FOREST_BACKEND'], cache_size=app.config['PREDICTION_CACHE_SIZE']
+), watch_paths=forest_artifacts(YieldPredictor.MODEL_PATH))
+health_analyzer = CropHealthAnalyzer(analysis_pool=analysis_pool, **analysis_options)
+price_predictor = PricePredictor(
+    seed=app.config['PRICE_SEED'], cache_ttl=app.config['PRICE_CACHE_TTL'],
+    cache_entries=app.config['PRICE_CACHE_ENTRIES']
+)
+LAZY_MODELS = [crop_recommender, disease_detector, yield_predictor]
+
+if app.config['WARMUP_MODELS']:
+    print("🚀 Warming up ML models in the background...")
+    warm_up_all(LAZY_MODELS)
+
+# Hot reload: new artifacts are loaded in the background and swapped in atomically
+model_watcher = None
+if app.config['MODEL_POLL_SECONDS'] > 0:
+    model_watcher = ModelWatcher(LAZY_MODELS, app.config['MODEL_POLL_SECONDS']).start()
+
+# Re-uploaded photos and retried calls are served from here without decoding
+analysis_cache = ResultCache(
+    max_entries=app.config['RESULT_CACHE_ENTRIES'],
+    max_bytes=int(app.config['RESULT_CACHE_MB'] * 1024 * 1024)
+)
+
+# Uploads are analyzed from memory; writing them to disk happens off the request path
+upload_writer = ThreadPoolExecutor(max_workers=2, thread_name_prefix='upload-writer')
+
+# ========== INSTRUMENTATION ==========
+@app.before_request
+def start_timing():
+    # Labelled by route pattern (not the raw path) to keep label cardinality bounded
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    g.metrics_token = metrics.begin_request(route)
+
+@app.after_request
+def finish_timing(response):
+    token = g.pop('metrics_token', None)
+    if token is not None:
+        timings, total = metrics.finish_request(token, response.status_code)
+        # Opt-in per-request breakdown: 'X-Timing: 1' request header or ?timing=1
+        if request.headers.get('X-Timing', request.args.get('timing', '')).lower() in ('1', 'true', 'yes'):
+            response.headers['X-Timing'] = metrics.format_timings(timings, total)
+    return response
+
+@app.teardown_request
+def abandon_timing(error=None):
+    # Unhandled exceptions skip after_request
+    token = g.pop('metrics_token', None)
+    if token is not None:
+        metrics.finish_request(token, 500)
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Per-route stage and request latency histograms (Prometheus text format)"""
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def write_upload(data, filepath):
+    try:
+        with open(filepath, 'wb') as f:
+            f.write(data)
+    except OSError as e:
+        print(f"⚠️ Failed to persist upload {filepath}: {e}")
+
+def persist_upload_async(data, filename):
+    """Queue an upload to be written to UPLOAD_FOLDER, returning its public URL"""
+    if not app.config['PERSIST_UPLOADS']:
+        return None
+    upload_writer.submit(write_upload, data, os.path.join(app.config['UPLOAD_FOLDER'], filename))
+    return f'/uploads/{filename}'
+
 # ========== CROP RECOMMENDATION ==========
 @app.route('/api/ml/crop-recommendation', methods=['POST'])
 def recommend_crop():
     try:
         data = request.json
-        recommendations = crop_recommender.predict(data)
+        # One snapshot per request: a concurrent hot swap does not affect it
+        model, model_version = crop_recommender.snapshot()
+        recommendations = model.predict(data)
         return jsonify({
             'recommendations': recommendations,
+            'modelVersion': model_version,
+            'timestamp': datetime.now().isoformat()
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/ml/crop-recommendation/batch', methods=['POST'])
+def recommend_crop_batch():
+    try:
+        data = request.json or {}
+        records = data.get('records')
+        if not isinstance(records, list):
+            return jsonify({'error': "'records' must be a list"}), 400
+
+        model, model_version = crop_recommender.snapshot()
+        results = model.predict_batch(records)
+        return jsonify({
+            'results': [
+                {'id': record.get('id', index), 'recommendations': recommendations}
+                for index, (record, recommendations) in enumerate(zip(records, results))
+            ],
+            'count': len(results),
+            'modelVersion': model_version,
             'timestamp': datetime.now().isoformat()
         }), 200
     except Exception as e:
@@ -56,10 +249,12 @@ def recommend_crop():
 def predict_yield():
     try:
         data = request.json
-        prediction = yield_predictor.predict(data)
+        model, model_version = yield_predictor.snapshot()
+        prediction = model.predict(data)
         return jsonify({
             'success': True,
             'prediction': prediction,
+            'modelVersion': model_version,
             'timestamp': datetime.now().isoformat()
         }), 200
     except Exception as e:
@@ -69,12 +264,103 @@ def predict_yield():
 @app.route('/api/ml/predict-price', methods=['POST'])
 def predict_price():
     try:
-        data = request.json
+        data = request.json or {}
         crop = data.get('crop', 'Rice')
-        price_data = price_predictor.predict_forecast(crop)
+        if not isinstance(crop, str):
+            return jsonify({'error': "'crop' must be a string"}), 400
+        # Optional horizon: 'weeks' (up to 52) or 'months' (up to 12), default 8 weeks
+        try:
+            weeks = price_predictor.resolve_horizon(data.get('weeks'), data.get('months'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        with stage('forecast'):
+            price_data = price_predictor.predict_forecast(crop, weeks=weeks)
         return jsonify({
             'success': True,
             'price_data': price_data,
+            'modelVersion': price_predictor.model_version,
+            'timestamp': datetime.now().isoformat()
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/ml/predict-price/bulk', methods=['POST'])
+def predict_price_bulk():
+    try:
+        data = request.json or {}
+        crops = data.get('crops')  # omit for every known crop
+        if crops is not None and not (isinstance(crops, list) and all(isinstance(crop, str) for crop in crops)):
+            return jsonify({'error': "'crops' must be a list of strings"}), 400
+        if crops and len(crops) > price_predictor.max_bulk_crops:
+            return jsonify({'error': f"At most {price_predictor.max_bulk_crops} crops per request"}), 400
+
+        try:
+            weeks = price_predictor.resolve_horizon(data.get('weeks'), data.get('months'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        with stage('forecast'):
+            bulk = price_predictor.predict_forecast_bulk(
+                crops, weeks=weeks, include_best_time=bool(data.get('includeBestTime', False))
+            )
+        return jsonify({
+            'success': True,
+            'price_data': bulk['forecasts'],
+            'bestTimeToSell': bulk.get('bestTimeToSell'),
+            'modelVersion': price_predictor.model_version,
+            'timestamp': datetime.now().isoformat()
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# ========== MODEL TRAINING ==========
+@app.route('/api/ml/train/incremental', methods=['POST'])
+def train_incremental():
+    """Grow the forests with rows appended to their datasets and swap them in live"""
+    try:
+        data = request.json or {}
+        models = {'crop': crop_recommender, 'yield': yield_predictor}
+        selected = data.get('model', 'all')
+        if selected != 'all' and selected not in models:
+            return jsonify({'error': "'model' must be 'crop', 'yield' or 'all'"}), 400
+
+        min_rows = int(data.get('minRows', 10))
+
+        def train(factory):
+            # Train a separate instance, so the active one stays intact for rollback
+            trainer = factory()
+            result = trainer.train_incremental(min_rows=min_rows)
+            return (None if result['status'] == 'unchanged' else trainer), result
+
+        results = {}
+        for name, model in models.items():
+            if selected in ('all', name):
+                results[name] = model.rebuild(train)
+                results[name]['modelVersion'] = model.version
+        return jsonify({
+            'success': True,
+            'results': results,
+            'timestamp': datetime.now().isoformat()
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/ml/models/<name>/<action>', methods=['POST'])
+def manage_model(name, action):
+    """Roll back to the previous version, or reload from the current artifacts"""
+    try:
+        model = next((m for m in LAZY_MODELS if m.name == name), None)
+        if model is None:
+            return jsonify({'error': f"Unknown model '{name}'"}), 404
+        if action == 'rollback':
+            model.rollback()
+        elif action == 'reload':
+            if not model.reload():
+                return jsonify({'error': model.reload_error, 'model': model.status()}), 500
+        else:
+            return jsonify({'error': "action must be 'rollback' or 'reload'"}), 400
+        return jsonify({
+            'success': True,
+            'model': {'name': name, **model.status()},
             'timestamp': datetime.now().isoformat()
         }), 200
     except Exception as e:
@@ -97,20 +383,30 @@ def analyze_crop_health():
         crop_type = request.form.get('cropType', 'unknown')
         farm_id = request.form.get('farmId', 'default')
         
-        # Save file
+        # Read upload into memory
+        with stage('upload'):
+            image_bytes = file.read()
+        digest = content_hash(image_bytes)
+        
+        # Analyze (or reuse the result for an identical upload)
+        analysis = analysis_cache.lookup('crop-health', health_analyzer.model_version, digest, crop_type)
+        cached = analysis is not None
+        if not cached:
+            analysis = health_analyzer.analyze_image(image_bytes, crop_type)
+            analysis_cache.store('crop-health', health_analyzer.model_version, digest, crop_type, result=analysis)
+        
+        # Save file (asynchronous, optional)
         filename = secure_filename(file.filename)
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         unique_filename = f"{user_id}_{farm_id}_{timestamp}_{filename}"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-        file.save(filepath)
-        
-        # Analyze
-        analysis = health_analyzer.analyze_image(filepath, crop_type)
+        image_url = persist_upload_async(image_bytes, unique_filename)
         
         return jsonify({
             'success': True,
             'analysis': analysis,
-            'imageUrl': f'/uploads/{unique_filename}',
+            'imageUrl': image_url,
+            'cached': cached,
+            'modelVersion': health_analyzer.model_version,
             'timestamp': datetime.now().isoformat()
         }), 200
         
@@ -129,20 +425,24 @@ def detect_disease():
         if not allowed_file(file.filename):
             return jsonify({'error': 'Invalid file type'}), 400
         
-        # Save temporarily
-        filename = secure_filename(file.filename)
-        temp_path = os.path.join(app.config['UPLOAD_FOLDER'], f'temp_{filename}')
-        file.save(temp_path)
-        
-        # Detect
-        detection = disease_detector.detect(temp_path)
-        
-        # Cleanup
-        os.remove(temp_path)
+        # Detect straight from the in-memory upload (or reuse the result for identical bytes)
+        with stage('upload'):
+            image_bytes = file.read()
+        digest = content_hash(image_bytes)
+        detector, registry_version = disease_detector.snapshot()
+        model_version = detector.model_version
+        detection = analysis_cache.lookup('disease', model_version, digest)
+        cached = detection is not None
+        if not cached:
+            detection = detector.detect(image_bytes)
+            if 'error' not in detection:
+                analysis_cache.store('disease', model_version, digest, result=detection)
         
         return jsonify({
             'success': True,
             'detection': detection,
+            'cached': cached,
+            'modelVersion': f'{registry_version}/{model_version}',
             'timestamp': datetime.now().isoformat()
         }), 200
         
@@ -152,11 +452,31 @@ def detect_disease():
 # ========== HEALTH CHECK ==========
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({
+    # Never blocks on loading models; reports their current state instead
+    models = {model.name: model.status() for model in LAZY_MODELS}
+    if disease_detector.state == 'ready':
+        models['disease_detector']['cnnBatching'] = disease_detector.batching_stats()
+        models['disease_detector']['cascade'] = disease_detector.cascade_stats()
+    for model in (crop_recommender, yield_predictor):
+        if model.state == 'ready' and model.cache:
+            models[model.name]['predictionCache'] = model.cache.stats()
+    models['price_predictor'] = {'state': 'ready', 'version': price_predictor.model_version, 'cache': price_predictor.cache_stats()}
+    models['health_analyzer'] = {'state': 'ready', 'version': health_analyzer.model_version}
+    if analysis_pool:
+        models['analysis_pool'] = {'state': 'ready', **analysis_pool.stats()}
+    response = {
         'status': 'healthy',
         'service': 'CBAMS ML Service',
+        'modelsReady': all(m['state'] == 'ready' for m in models.values()),
+        'models': models,
+        'resultCache': analysis_cache.stats(),
+        'hotReload': {'pollSeconds': app.config['MODEL_POLL_SECONDS'] if model_watcher else None},
         'timestamp': datetime.now().isoformat()
-    }), 200
+    }
+    # Concurrency/backpressure counters when served through asgi.py
+    if 'SERVING_STATS' in app.config:
+        response['serving'] = app.config['SERVING_STATS']()
+    return jsonify(response), 200
 
 if __name__ == '__main__':
     print("\n" + "="*50)
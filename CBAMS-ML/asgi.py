@@ -0,0 +1,144 @@
+"""
+Production serving mode: the Flask app behind an ASGI server.
+
+    cd CBAMS-ML && python asgi.py
+    # or: uvicorn asgi:application --host 0.0.0.0 --port 5001
+
+Routes and JSON contracts are those of app.py. a2wsgi runs each request on a
+bounded worker thread pool, so a slow TensorFlow/OpenCV call no longer holds up
+the event loop. Requests beyond the concurrency limit are rejected with 429, and
+requests that run longer than the timeout are answered with 504.
+"""
+import asyncio
+import json
+import os
+import threading
+
+from a2wsgi import WSGIMiddleware
+
+from app import app
+
+# Threads running model code, and requests admitted at once (running + queued for a thread)
+WORKER_THREADS = int(os.environ.get('ML_WORKER_THREADS', 4))
+MAX_CONCURRENCY = int(os.environ.get('ML_MAX_CONCURRENCY', WORKER_THREADS * 4))
+# Seconds before a request is answered with 504 (its thread finishes in the background)
+REQUEST_TIMEOUT = float(os.environ.get('ML_REQUEST_TIMEOUT', 30))
+# Cheap endpoints served outside the model pool, so monitoring works while saturated
+UNLIMITED_PATHS = {'/health', '/metrics'}
+
+
+class ConcurrencyLimiter:
+    """
+    ASGI middleware that admits at most max_concurrency requests at a time.
+    An admission counter (not the worker pool queue) enforces the limit, so
+    overload is answered immediately with 429 instead of piling up.
+    unlimited_paths are passed to unlimited_app without admission or timeout.
+    """
+
+    def __init__(self, app, max_concurrency=16, request_timeout=30, unlimited_app=None, unlimited_paths=()):
+        self.app = app
+        self.unlimited_app = unlimited_app or app
+        self.max_concurrency = max(1, max_concurrency)
+        self.request_timeout = request_timeout
+        self.unlimited_paths = set(unlimited_paths)
+
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+        elif scope['path'] in self.unlimited_paths:
+            await self.unlimited_app(scope, receive, send)
+        else:
+            await self.handle_http(scope, receive, send)
+
+    def try_acquire(self):
+        with self._lock:
+            if self.in_flight >= self.max_concurrency:
+                self.rejected += 1
+                return False
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            return True
+
+    def release(self, _task=None):
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+
+    async def handle_http(self, scope, receive, send):
+        if not self.try_acquire():
+            await self.send_error(send, 429, 'Server busy, retry shortly', [(b'retry-after', b'1')])
+            return
+
+        response = {'started': False, 'abandoned': False}
+
+        async def forward(message):
+            # Output of a request already answered with 504 is dropped
+            if response['abandoned']:
+                return
+            response['started'] = True
+            await send(message)
+
+        task = asyncio.ensure_future(self.app(scope, receive, forward))
+        # The slot is held until the work really finishes, even after a timeout
+        task.add_done_callback(self.release)
+        try:
+            await asyncio.wait_for(asyncio.shield(task), self.request_timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timed_out += 1
+            if response['started']:
+                # Too late for a 504: let the response finish
+                await task
+                return
+            response['abandoned'] = True
+            await self.send_error(send, 504, f'Request timed out after {self.request_timeout:g}s')
+
+    async def send_error(self, send, status, message, extra_headers=()):
+        body = json.dumps({'error': message}).encode()
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode()),
+                        *extra_headers]
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    def stats(self):
+        with self._lock:
+            return {
+                'inFlight': self.in_flight,
+                'peakInFlight': self.peak_in_flight,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'timedOut': self.timed_out,
+                'maxConcurrency': self.max_concurrency,
+                'requestTimeoutSeconds': self.request_timeout
+            }
+
+
+application = ConcurrencyLimiter(
+    WSGIMiddleware(app.wsgi_app, workers=WORKER_THREADS),
+    max_concurrency=MAX_CONCURRENCY,
+    request_timeout=REQUEST_TIMEOUT,
+    # A pool of its own, so health checks never queue behind model work
+    unlimited_app=WSGIMiddleware(app.wsgi_app, workers=1),
+    unlimited_paths=UNLIMITED_PATHS
+)
+# Reported by /health
+app.config['SERVING_STATS'] = lambda: dict(application.stats(), workerThreads=WORKER_THREADS)
+
+if __name__ == '__main__':
+    import uvicorn
+
+    print("\n" + "="*50)
+    print("🌾 CBAMS ML Service Starting (ASGI)...")
+    print(f"⚙️  {WORKER_THREADS} worker threads, max {MAX_CONCURRENCY} concurrent requests, {REQUEST_TIMEOUT:g}s timeout")
+    print("="*50)
+    uvicorn.run(application, host='0.0.0.0', port=int(os.environ.get('ML_PORT', 5001)))
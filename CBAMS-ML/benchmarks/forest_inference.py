@@ -0,0 +1,63 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Run from CBAMS-ML/: python benchmarks/forest_inference.py
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.crop_recommendation import CropRecommendationModel
+from models.flat_forest import FlatForest
+from models.yield_predictor import YieldPredictor
+
+
+def time_calls(fn, X, repeats):
+    """p50/p99 latency in milliseconds of fn(X)"""
+    fn(X)  # warm-up
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(X)
+        samples.append((time.perf_counter() - start) * 1000)
+    return np.percentile(samples, 50), np.percentile(samples, 99)
+
+
+def random_features(n_rows, n_features, rng):
+    # Covers the ranges seen in both datasets (N/P/K, temperature, humidity, pH, rainfall, area)
+    return rng.uniform(0, 250, size=(n_rows, n_features))
+
+
+parser = argparse.ArgumentParser(description="Compare sklearn and flat-array forest inference")
+parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 100, 10000])
+parser.add_argument('--repeats', type=int, default=50)
+args = parser.parse_args()
+
+rng = np.random.default_rng(0)
+forests = {
+    'crop_recommendation': (CropRecommendationModel('sklearn').model, 'predict_proba'),
+    'yield': (YieldPredictor('sklearn').model, 'predict')
+}
+
+print(f"\n{'model':<20} {'batch':>6} {'sklearn p50':>12} {'p99':>9} {'flat p50':>10} {'p99':>9} {'speedup':>8}  identical")
+failed = False
+for name, (model, method) in forests.items():
+    flat = FlatForest.from_sklearn(model)
+    for batch_size in args.batch_sizes:
+        X = random_features(batch_size, model.n_features_in_, rng)
+        reference = getattr(model, method)(X)
+        identical = np.array_equal(reference, getattr(flat, method)(X))
+        failed |= not identical
+
+        # Fewer repeats for very large batches
+        repeats = max(5, args.repeats // max(1, batch_size // 1000))
+        sk_p50, sk_p99 = time_calls(getattr(model, method), X, repeats)
+        flat_p50, flat_p99 = time_calls(getattr(flat, method), X, repeats)
+        print(f"{name:<20} {batch_size:>6} {sk_p50:>10.3f}ms {sk_p99:>7.3f}ms {flat_p50:>8.3f}ms "
+              f"{flat_p99:>7.3f}ms {sk_p50 / flat_p50:>7.1f}x  {'✅' if identical else '❌'}")
+
+if failed:
+    print("\n❌ Flat-array outputs differ from sklearn")
+    sys.exit(1)
+print("\n✨ Flat-array outputs match sklearn exactly")
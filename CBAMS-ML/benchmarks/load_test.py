@@ -0,0 +1,108 @@
+import argparse
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import requests
+
+# Run from CBAMS-ML/: python benchmarks/load_test.py --url http://localhost:5001 --url http://localhost:8001
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.sample_images import generate_leaf_image
+
+CROP_INPUT = {'nitrogen': 90, 'phosphorus': 42, 'potassium': 43, 'temperature': 20.8,
+              'humidity': 82.0, 'ph': 6.5, 'rainfall': 202.9}
+YIELD_INPUT = {'nitrogen': 90, 'phosphorus': 42, 'potassium': 43, 'temperature': 25.0,
+               'rainfall': 120.0, 'area': 2.0}
+
+
+class Scenario:
+    """Weighted mix of ML endpoints; image uploads are made unique per request to bypass result caches"""
+
+    def __init__(self, image_size):
+        self.leaf = generate_leaf_image('leaf_spot', image_size, image_size, seed=7)
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+
+    def unique_png(self):
+        with self.lock:
+            n = next(self.counter)
+        image = self.leaf.copy()
+        image[0, 0] = (n & 0xFF, (n >> 8) & 0xFF, (n >> 16) & 0xFF)
+        return cv2.imencode('.png', image)[1].tobytes()
+
+    def requests(self, mix):
+        calls = {
+            'crop': lambda s, url: s.post(f'{url}/api/ml/crop-recommendation', json=CROP_INPUT),
+            'yield': lambda s, url: s.post(f'{url}/api/ml/predict-yield', json=YIELD_INPUT),
+            'price': lambda s, url: s.post(f'{url}/api/ml/predict-price', json={'crop': 'Rice'}),
+            'disease': lambda s, url: s.post(f'{url}/api/ml/detect-disease',
+                                             files={'image': ('leaf.png', self.unique_png(), 'image/png')}),
+            'health': lambda s, url: s.post(f'{url}/api/ml/analyze-crop-health',
+                                            files={'image': ('leaf.png', self.unique_png(), 'image/png')},
+                                            data={'cropType': 'rice'})
+        }
+        return itertools.cycle([calls[name] for name in mix])
+
+
+def run_load(url, scenario, mix, concurrency, duration):
+    """Closed-loop load: `concurrency` clients issuing requests back to back for `duration` seconds"""
+    deadline = time.monotonic() + duration
+    latencies, statuses = [], Counter()
+    lock = threading.Lock()
+
+    def client(_):
+        session = requests.Session()
+        calls = scenario.requests(mix)
+        while time.monotonic() < deadline:
+            call = next(calls)
+            start = time.perf_counter()
+            try:
+                status = call(session, url).status_code
+            except requests.RequestException:
+                status = 'error'
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                statuses[status] += 1
+                if status == 200:
+                    latencies.append(elapsed)
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(client, range(concurrency)))
+    wall = time.monotonic() - started
+
+    ok = statuses[200]
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if latencies else (0, 0, 0)
+    return {'throughput': ok / wall, 'p50': p50, 'p95': p95, 'p99': p99, 'statuses': statuses}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare ML service throughput across servers (e.g. Flask vs ASGI)")
+    parser.add_argument('--url', action='append', required=True, help="Base URL; repeat to compare servers")
+    parser.add_argument('--mix', nargs='+', default=['crop', 'yield', 'price', 'disease', 'health'],
+                        choices=['crop', 'yield', 'price', 'disease', 'health'], help="Endpoints cycled by each client")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--duration', type=float, default=15, help="Seconds per run")
+    parser.add_argument('--image-size', type=int, default=512)
+    args = parser.parse_args()
+
+    scenario = Scenario(args.image_size)
+    print(f"\n{'server':<28} {'clients':>7} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9}  statuses")
+    for url in args.url:
+        try:
+            requests.get(f'{url}/health', timeout=5).raise_for_status()
+        except requests.RequestException as e:
+            print(f"❌ {url} is not reachable: {e}")
+            continue
+        for concurrency in args.concurrency:
+            result = run_load(url, scenario, args.mix, concurrency, args.duration)
+            statuses = ' '.join(f'{code}:{count}' for code, count in sorted(result['statuses'].items(), key=str))
+            print(f"{url:<28} {concurrency:>7} {result['throughput']:>8.1f} {result['p50']:>7.1f}ms "
+                  f"{result['p95']:>7.1f}ms {result['p99']:>7.1f}ms  {statuses}")
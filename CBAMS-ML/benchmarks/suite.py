@@ -0,0 +1,271 @@
+import argparse
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+import requests
+
+# Run from CBAMS-ML/:
+#   python benchmarks/suite.py --output bench.json                      # microbenchmarks
+#   python benchmarks/suite.py --url http://localhost:5001 --output bench.json   # + HTTP load
+#   python benchmarks/suite.py --start-server asgi --output bench.json  # starts the service itself
+#   python benchmarks/suite.py --compare benchmarks/baseline.json       # flag regressions
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load_test import Scenario, run_load
+from models import synthetic_data
+from models.crop_health_analyzer import CropHealthAnalyzer
+from models.crop_recommendation import CropRecommendationModel
+from models.disease_detector import DiseaseDetector
+from models.price_predictor import PricePredictor
+from models.sample_images import generate_leaf_image
+from models.yield_predictor import YieldPredictor
+
+RESOLUTIONS = {'vga': (640, 480), '1080p': (1920, 1080), '12mp': (4000, 3000)}
+BATCH_SIZES = (1, 100, 10000)
+HTTP_ENDPOINTS = ('crop', 'yield', 'price', 'disease', 'health')
+
+
+def time_case(fn, min_time, min_repeats, max_repeats):
+    """Call fn until both min_time seconds and min_repeats calls are reached; latency stats in ms"""
+    fn()  # warm-up
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < max_repeats and (len(samples) < min_repeats or time.perf_counter() - started < min_time):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {'p50Ms': float(p50), 'p95Ms': float(p95), 'p99Ms': float(p99),
+            'meanMs': float(np.mean(samples)), 'repeats': len(samples)}
+
+
+def tabular_records(dataset, n_rows, seed):
+    """Synthetic request payloads (API field names) drawn from the training-data generator"""
+    frame = synthetic_data.generate(dataset, n_rows, seed=seed)
+    names = {'N': 'nitrogen', 'P': 'phosphorus', 'K': 'potassium'}
+    columns = [c for c in frame.columns if c not in ('label', 'yield')]
+    return frame[columns].rename(columns=names).astype(float).to_dict('records')
+
+
+def checked(result):
+    """detect() reports failures in the result instead of raising"""
+    if isinstance(result, dict) and 'error' in result:
+        raise RuntimeError(result['error'])
+    return result
+
+
+def build_cases(args):
+    """(name, callable, items per call) for every microbenchmark"""
+    cases = []
+
+    # Forests: memoization off, so every call runs the model
+    crop = CropRecommendationModel(args.backend, cache_size=0)
+    yield_model = YieldPredictor(args.backend, cache_size=0)
+    crop_records = tabular_records('crop', max(args.batch_sizes), seed=1)
+    yield_records = tabular_records('yield', 1, seed=2)
+    cases.append(('crop.predict', lambda: crop.predict(crop_records[0]), 1))
+    for size in args.batch_sizes:
+        batch = crop_records[:size]
+        cases.append((f'crop.predict_batch[{size}]', lambda batch=batch: crop.predict_batch(batch), size))
+    cases.append(('yield.predict', lambda: yield_model.predict(yield_records[0]), 1))
+
+    # Image models on encoded uploads (decode included), one healthy and one diseased scene
+    detector = DiseaseDetector(args.cnn_model)
+    analyzer = CropHealthAnalyzer()
+    for label in args.resolutions:
+        width, height = RESOLUTIONS[label]
+        for condition in ('healthy', 'rust'):
+            image = generate_leaf_image(condition, width, height, seed=3)
+            upload = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+            cases.append((f'disease.detect[{label},{condition}]', lambda upload=upload: checked(detector.detect(upload)), 1))
+            cases.append((f'health.analyze_image[{label},{condition}]',
+                          lambda upload=upload: analyzer.analyze_image(upload, 'rice'), 1))
+
+    # Price forecasts: cold (cache expires immediately) and warm
+    cold, warm = PricePredictor(cache_ttl=0), PricePredictor()
+    cases.append(('price.predict_forecast[cold]', lambda: cold.predict_forecast('Rice'), 1))
+    cases.append(('price.predict_forecast[warm]', lambda: warm.predict_forecast('Rice'), 1))
+    cases.append(('price.predict_forecast_bulk[cold]', lambda: cold.predict_forecast_bulk(include_best_time=True),
+                  len(cold.base_prices)))
+    return cases
+
+
+def run_micro(args):
+    pattern = re.compile(args.only) if args.only else None
+    results = {}
+    print(f"\n{'benchmark':<44} {'p50':>10} {'p95':>10} {'items/s':>11} {'runs':>6}")
+    for name, fn, items in build_cases(args):
+        if pattern and not pattern.search(name):
+            continue
+        stats = time_case(fn, args.min_time, args.min_repeats, args.max_repeats)
+        stats['itemsPerSecond'] = items * 1000 / stats['p50Ms'] if stats['p50Ms'] else 0.0
+        results[name] = stats
+        print(f"{name:<44} {stats['p50Ms']:>8.3f}ms {stats['p95Ms']:>8.3f}ms {stats['itemsPerSecond']:>11.1f} {stats['repeats']:>6}")
+    return results
+
+
+def run_http(args):
+    """Closed-loop load against a running app.py / asgi.py, one endpoint at a time, then the full mix"""
+    try:
+        requests.get(f'{args.url}/health', timeout=5).raise_for_status()
+    except requests.RequestException as e:
+        print(f"❌ {args.url} is not reachable: {e}")
+        return {}
+
+    scenario = Scenario(args.image_size)
+    mixes = {endpoint: [endpoint] for endpoint in HTTP_ENDPOINTS}
+    mixes['mixed'] = list(HTTP_ENDPOINTS)
+    results = {}
+    print(f"\n{'scenario':<28} {'clients':>7} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9}  statuses")
+    for mix_name, mix in mixes.items():
+        for concurrency in args.concurrency:
+            result = run_load(args.url, scenario, mix, concurrency, args.duration)
+            name = f'http.{mix_name}[c={concurrency}]'
+            results[name] = {
+                'p50Ms': float(result['p50']), 'p95Ms': float(result['p95']), 'p99Ms': float(result['p99']),
+                'throughput': result['throughput'],
+                'statuses': {str(code): count for code, count in result['statuses'].items()}
+            }
+            statuses = ' '.join(f'{code}:{count}' for code, count in sorted(results[name]['statuses'].items()))
+            print(f"{name:<28} {concurrency:>7} {result['throughput']:>8.1f} {result['p50']:>7.1f}ms "
+                  f"{result['p95']:>7.1f}ms {result['p99']:>7.1f}ms  {statuses}")
+    return results
+
+
+def start_server(mode, port, timeout=300):
+    """
+    Start the service ('flask': app.py on Flask's threaded server, 'asgi': asgi.py)
+    and wait until every model reports ready. Returns (process, base URL).
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if mode == 'asgi':
+        command = [sys.executable, 'asgi.py']
+    else:
+        command = [sys.executable, '-m', 'flask', '--app', 'app', 'run', '--port', str(port), '--with-threads']
+    process = subprocess.Popen(command, cwd=root, env={**os.environ, 'ML_PORT': str(port)})
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{mode} server exited with code {process.returncode}")
+        try:
+            if requests.get(f'{url}/health', timeout=2).json().get('modelsReady'):
+                return process, url
+        except (requests.RequestException, ValueError):
+            pass
+        time.sleep(1)
+    process.terminate()
+    raise RuntimeError(f"{mode} server not ready after {timeout}s")
+
+
+def environment():
+    """Context needed to judge whether two result files are comparable"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'forestBackend': os.environ.get('ML_FOREST_BACKEND', 'sklearn')
+    }
+
+
+def compare(current, baseline, threshold):
+    """
+    Compare p50 latencies (and HTTP throughput) against a baseline.
+    Returns the names of regressed benchmarks.
+    """
+    regressions = []
+    print(f"\n{'benchmark':<44} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, stats in current.items():
+        base = baseline.get(name)
+        if not base or not base.get('p50Ms'):
+            print(f"{name:<44} {'-':>10} {stats['p50Ms']:>8.3f}ms {'new':>8}")
+            continue
+        change = stats['p50Ms'] / base['p50Ms'] - 1
+        # Throughput is the headline number for load scenarios
+        if 'throughput' in stats and base.get('throughput'):
+            change = max(change, base['throughput'] / max(stats['throughput'], 1e-9) - 1)
+        if change > threshold:
+            flag = '❌ slower'
+            regressions.append(name)
+        elif change < -threshold:
+            flag = '✅ faster'
+        else:
+            flag = ''
+        print(f"{name:<44} {base['p50Ms']:>8.3f}ms {stats['p50Ms']:>8.3f}ms {change * 100:>+7.1f}%  {flag}")
+    for name in sorted(set(baseline) - set(current)):
+        print(f"{name:<44} {'(not run)':>10}")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark every ML model method and, optionally, the HTTP service")
+    parser.add_argument('--only', help="Regex selecting microbenchmarks by name (e.g. 'disease|health')")
+    parser.add_argument('--resolutions', nargs='+', choices=list(RESOLUTIONS), default=list(RESOLUTIONS))
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=list(BATCH_SIZES))
+    parser.add_argument('--backend', choices=['sklearn', 'flat', 'hybrid'], default=None,
+                        help="Forest backend (default ML_FOREST_BACKEND)")
+    parser.add_argument('--cnn-model', default=os.environ.get('ML_DISEASE_MODEL_PATH'), help="Custom CNN for Tier 1B")
+    parser.add_argument('--min-time', type=float, default=1.0, help="Seconds per microbenchmark (at least)")
+    parser.add_argument('--min-repeats', type=int, default=5)
+    parser.add_argument('--max-repeats', type=int, default=1000)
+    parser.add_argument('--skip-micro', action='store_true', help="Only run the HTTP scenario")
+    parser.add_argument('--url', help="Base URL of a running service for the HTTP load scenario")
+    parser.add_argument('--start-server', choices=['flask', 'asgi'], help="Start app.py for the HTTP scenario and stop it afterwards")
+    parser.add_argument('--port', type=int, default=5099, help="Port for --start-server")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--duration', type=float, default=10, help="Seconds per HTTP run")
+    parser.add_argument('--image-size', type=int, default=512)
+    parser.add_argument('--output', help="Write results as JSON")
+    parser.add_argument('--compare', help="Baseline JSON to compare against (exit code 1 on regressions)")
+    parser.add_argument('--threshold', type=float, default=0.15, help="Relative slowdown flagged as a regression")
+    args = parser.parse_args()
+
+    report = {'environment': environment(), 'benchmarks': {}}
+    if not args.skip_micro:
+        report['benchmarks'].update(run_micro(args))
+    server = None
+    if args.start_server:
+        print(f"🚀 Starting {args.start_server} server on port {args.port}...")
+        server, args.url = start_server(args.start_server, args.port)
+        report['environment']['server'] = args.start_server
+    try:
+        if args.url:
+            report['benchmarks'].update(run_http(args))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✨ Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        base_env = baseline.get('environment', {})
+        if (base_env.get('cpus'), base_env.get('platform')) != (report['environment']['cpus'], report['environment']['platform']):
+            print(f"⚠️ Baseline was recorded on a different machine ({base_env.get('platform')}, {base_env.get('cpus')} cpus)")
+        regressions = compare(report['benchmarks'], baseline.get('benchmarks', {}), args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) beyond {args.threshold * 100:.0f}%: {', '.join(regressions)}")
+            sys.exit(1)
+        print(f"\n✨ No regressions beyond {args.threshold * 100:.0f}%")
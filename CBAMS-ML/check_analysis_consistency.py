@@ -0,0 +1,61 @@
+import argparse
+import os
+import sys
+import time
+
+# Add the current directory and models directory to path
+sys.path.append(os.getcwd())
+
+from models.crop_health_analyzer import CropHealthAnalyzer
+from models.disease_detector import DiseaseDetector
+from models.sample_images import generate_sample_set
+
+# Consistency check: downsampled / tiled analysis must classify the sample set
+# exactly like the full resolution pipeline.
+
+parser = argparse.ArgumentParser(description="Compare reduced-resolution and tiled analysis against full resolution")
+parser.add_argument('--width', type=int, default=4000)
+parser.add_argument('--height', type=int, default=3000)
+parser.add_argument('--max-side', type=int, default=1024)
+parser.add_argument('--tile-rows', type=int, default=256)
+parser.add_argument('--seeds', type=int, default=3)
+args = parser.parse_args()
+
+modes = {
+    'full': {},
+    'downscaled': {'analysis_max_side': args.max_side},
+    'tiled': {'tile_rows': args.tile_rows},
+    'downscaled+tiled': {'analysis_max_side': args.max_side, 'tile_rows': args.tile_rows}
+}
+detectors = {mode: DiseaseDetector(**options) for mode, options in modes.items()}
+analyzers = {mode: CropHealthAnalyzer(**options) for mode, options in modes.items()}
+timings = {mode: 0.0 for mode in modes}
+
+print(f"\n🔬 Checking {args.width}x{args.height} samples (max side {args.max_side}, {args.tile_rows}-row tiles)")
+mismatches = 0
+for name, image in generate_sample_set(args.width, args.height, seeds=range(args.seeds)):
+    results = {}
+    for mode in modes:
+        start = time.perf_counter()
+        indicators = detectors[mode].analyze_disease_indicators(image)
+        health = analyzers[mode].analyze_image(image)
+        timings[mode] += time.perf_counter() - start
+
+        results[mode] = (
+            detectors[mode].classify_disease_heuristically(indicators)['key'],
+            detectors[mode].calculate_severity(indicators)['level'],
+            health['status']
+        )
+
+    ok = all(result == results['full'] for result in results.values())
+    mismatches += not ok
+    print(f"{'✅' if ok else '❌'} {name:<20} " + '  '.join(f"{mode}={result}" for mode, result in results.items()))
+
+print("\n⏱️ Total analysis time per mode:")
+for mode, seconds in timings.items():
+    print(f"   {mode:<18} {seconds:.2f}s")
+
+if mismatches:
+    print(f"\n❌ {mismatches} sample(s) classified differently from full resolution")
+    sys.exit(1)
+print("\n✨ All modes match full resolution results")
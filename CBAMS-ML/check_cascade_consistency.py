@@ -0,0 +1,52 @@
+import argparse
+import os
+import sys
+import time
+
+# Add the current directory and models directory to path
+sys.path.append(os.getcwd())
+
+from models.disease_detector import DiseaseDetector
+from models.sample_images import generate_sample_set
+
+# Consistency check: the early-exit cascade must diagnose the sample set exactly
+# like the full pipeline. Only images the full pipeline calls healthy may exit early.
+
+parser = argparse.ArgumentParser(description="Compare cascaded disease detection against the full pipeline")
+parser.add_argument('--sizes', nargs='+', default=['1024x768', '2000x1500', '4000x3000'], help="WIDTHxHEIGHT")
+parser.add_argument('--seeds', type=int, default=3)
+parser.add_argument('--cascade-side', type=int, default=256)
+parser.add_argument('--max-side', type=int, default=0, help="Analysis resolution of both pipelines (0 = full)")
+args = parser.parse_args()
+
+options = {'analysis_max_side': args.max_side or None}
+full = DiseaseDetector(**options)
+cascade = DiseaseDetector(cascade=True, cascade_side=args.cascade_side, **options)
+timings = {'full': 0.0, 'cascade': 0.0}
+
+mismatches = 0
+for size in args.sizes:
+    width, height = (int(value) for value in size.lower().split('x'))
+    print(f"\n🔬 {width}x{height} samples (screen {args.cascade_side}px)")
+    for name, image in generate_sample_set(width, height, seeds=range(args.seeds)):
+        results = {}
+        for mode, detector in (('full', full), ('cascade', cascade)):
+            start = time.perf_counter()
+            result = detector.detect(image)
+            timings[mode] += time.perf_counter() - start
+            results[mode] = (result['disease']['name'], result.get('severity', {}).get('level'), result.get('analysisTier'))
+
+        ok = results['cascade'][:2] == results['full'][:2]
+        mismatches += not ok
+        exited = results['cascade'][2] == 'Cascade (early exit)'
+        print(f"{'✅' if ok else '❌'} {name:<20} full={results['full'][:2]}  cascade={results['cascade'][:2]}"
+              f"{'  (early exit)' if exited else ''}")
+
+stats = cascade.cascade_stats()
+print(f"\n⏩ {stats['earlyExits']} of {stats['screened']} image(s) exited early; escalated by {stats['escalatedBy']}")
+print(f"⏱️ Total detection time: full {timings['full']:.2f}s, cascade {timings['cascade']:.2f}s")
+
+if mismatches:
+    print(f"\n❌ {mismatches} sample(s) diagnosed differently with the cascade: tighten CASCADE_THRESHOLDS")
+    sys.exit(1)
+print("\n✨ Cascade matches the full pipeline on every sample")
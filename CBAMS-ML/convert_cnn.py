@@ -0,0 +1,97 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Add the current directory and models directory to path
+sys.path.append(os.getcwd())
+
+from models.cnn_backends import KerasBackend, TFLiteBackend, convert_to_tflite, load_tensorflow, tflite_path_for
+from models.image_utils import decode_image, prepare_cnn_input
+from models.sample_images import generate_sample_set
+
+# Convert the Tier 1B Keras model to TFLite, then check the converted model against
+# Keras: top-1 agreement and probability drift on a sample set, plus latency of both.
+# The service picks the result up with ML_CNN_BACKEND=tflite.
+#
+#   python convert_cnn.py trained_models/disease_cnn.h5 --quantization int8 --threads 4
+
+
+def load_inputs(directory, limit):
+    """CNN inputs from real photos in a directory"""
+    inputs = []
+    for root, _, files in os.walk(directory):
+        for filename in sorted(files):
+            if filename.lower().endswith(('.png', '.jpg', '.jpeg')) and len(inputs) < limit:
+                inputs.append(prepare_cnn_input(decode_image(os.path.join(root, filename))))
+    return inputs
+
+
+def synthetic_inputs(seeds):
+    return [prepare_cnn_input(image) for _, image in generate_sample_set(448, 336, seeds=seeds)]
+
+
+def time_predict(backend, batch, repeats):
+    """p50 latency in milliseconds"""
+    backend.predict(batch)  # warm-up (and the TFLite interpreter for this batch size)
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        backend.predict(batch)
+        samples.append((time.perf_counter() - start) * 1000)
+    return float(np.percentile(samples, 50))
+
+
+parser = argparse.ArgumentParser(description="Convert the disease CNN to TFLite and check parity with Keras")
+parser.add_argument('model_path', help="Saved Keras model (.h5 / .keras / SavedModel)")
+parser.add_argument('--output', help="TFLite file (default: next to the model, .tflite)")
+parser.add_argument('--quantization', choices=['none', 'float16', 'dynamic', 'int8'], default='float16')
+parser.add_argument('--calibration-dir', help="Photos for int8 calibration (default: synthetic leaves)")
+parser.add_argument('--eval-dir', help="Photos for the parity check (default: synthetic leaves)")
+parser.add_argument('--samples', type=int, default=200, help="Max photos read from each directory")
+parser.add_argument('--threads', type=int, default=None, help="TFLite interpreter threads")
+parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8])
+parser.add_argument('--repeats', type=int, default=30)
+parser.add_argument('--min-agreement', type=float, default=0.98, help="Required top-1 agreement with Keras")
+parser.add_argument('--skip-convert', action='store_true', help="Only check an existing TFLite file")
+args = parser.parse_args()
+
+if load_tensorflow() is None:
+    print("❌ TensorFlow is required for conversion and the Keras comparison")
+    sys.exit(1)
+
+output = args.output or tflite_path_for(args.model_path)
+if not args.skip_convert:
+    calibration = None
+    if args.quantization == 'int8':
+        calibration = load_inputs(args.calibration_dir, args.samples) if args.calibration_dir else synthetic_inputs(range(10, 20))
+    print(f"🗜️ Converting {args.model_path} ({args.quantization})...")
+    convert_to_tflite(args.model_path, output, args.quantization, calibration)
+keras_size = f" (Keras file {os.path.getsize(args.model_path) / 1e6:.2f} MB)" if os.path.isfile(args.model_path) else ''
+print(f"📦 {output}: {os.path.getsize(output) / 1e6:.2f} MB{keras_size}")
+
+keras = KerasBackend(args.model_path)
+lite = TFLiteBackend(output, args.threads, max_batch_size=max(args.batch_sizes))
+
+# Accuracy parity: same preprocessed inputs through both backends
+inputs = np.stack(load_inputs(args.eval_dir, args.samples) if args.eval_dir else synthetic_inputs(range(3)))
+reference = keras.predict(inputs)
+converted = np.concatenate([lite.predict(inputs[i:i + 1]) for i in range(len(inputs))])
+agreement = float(np.mean(reference.argmax(axis=1) == converted.argmax(axis=1)))
+drift = np.abs(reference - converted)
+print(f"\n🎯 Top-1 agreement {agreement * 100:.2f}% on {len(inputs)} images; "
+      f"probability drift mean {drift.mean():.4f}, max {drift.max():.4f}")
+
+print(f"\n{'batch':>6} {'keras p50':>11} {'tflite p50':>11} {'speedup':>8}")
+for batch_size in args.batch_sizes:
+    batch = np.resize(inputs, (batch_size,) + inputs.shape[1:])
+    keras_ms = time_predict(keras, batch, args.repeats)
+    lite_ms = time_predict(lite, batch, args.repeats)
+    print(f"{batch_size:>6} {keras_ms:>9.2f}ms {lite_ms:>9.2f}ms {keras_ms / lite_ms:>7.1f}x")
+
+if agreement < args.min_agreement:
+    print(f"\n❌ Agreement below {args.min_agreement * 100:.1f}%: keep the Keras backend or try a lighter quantization")
+    sys.exit(1)
+print(f"\n✨ Parity OK. Serve it with ML_CNN_BACKEND=tflite (ML_CNN_THREADS={args.threads or 'default'})")
@@ -0,0 +1,36 @@
+import argparse
+import os
+import sys
+import time
+
+# Add the current directory and models directory to path
+sys.path.append(os.getcwd())
+
+from models import synthetic_data
+from models.dataset_store import write_chunks
+
+# Large synthetic datasets for load and training tests, streamed to disk in chunks.
+#
+#   python generate_data.py crop --rows 10000000 --output datasets/crop_10m.parquet
+#   python generate_data.py yield --rows 2000000 --output datasets/yield_2m.csv --seed 7
+
+parser = argparse.ArgumentParser(description="Generate synthetic crop recommendation / yield datasets")
+parser.add_argument('dataset', choices=sorted(synthetic_data.GENERATORS))
+parser.add_argument('--rows', type=int, required=True, help="Total rows (crop rows are split evenly across crops)")
+parser.add_argument('--output', required=True, help="Output file; format from the extension (.csv, .parquet, .feather)")
+parser.add_argument('--seed', type=int, default=42)
+parser.add_argument('--chunk-rows', type=int, default=synthetic_data.CHUNK_ROWS, help="Rows generated and written at a time")
+args = parser.parse_args()
+
+fmt = os.path.splitext(args.output)[1].lstrip('.').lower()
+if fmt not in ('csv', 'parquet', 'feather'):
+    parser.error("--output must end in .csv, .parquet or .feather")
+
+os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+generate_chunks = synthetic_data.GENERATORS[args.dataset][0]
+start = time.perf_counter()
+chunks = generate_chunks(args.rows, synthetic_data.make_rng(args.seed), args.chunk_rows)
+rows = write_chunks(chunks, args.output, fmt)
+elapsed = time.perf_counter() - start
+print(f"✅ Wrote {rows:,} {args.dataset} rows to {args.output} in {elapsed:.1f}s "
+      f"({rows / max(elapsed, 1e-9):,.0f} rows/s, {os.path.getsize(args.output) / 1e6:.1f} MB)")
@@ -0,0 +1,171 @@
+import os
+import threading
+
+import numpy as np
+
+# Tier 1B inference backends. 'keras' runs the saved Keras model on full TensorFlow;
+# 'tflite' runs a converted (float16 / int8) artifact through the TFLite interpreter,
+# which needs only the small tflite_runtime package and uses a fixed CPU thread count.
+# Both take a float32 batch from prepare_cnn_input and return class probabilities.
+DEFAULT_CNN_BACKEND = os.environ.get('ML_CNN_BACKEND', 'keras')
+
+# TensorFlow is imported on demand: it adds seconds to startup and is only
+# needed when a custom CNN model is configured
+tf = None
+
+
+def load_tensorflow():
+    """Import TensorFlow lazily, returning None if it is not installed"""
+    global tf
+    if tf is None:
+        try:
+            import tensorflow
+            tf = tensorflow
+        except ImportError:
+            return None
+    return tf
+
+
+def load_interpreter_class():
+    """tflite_runtime's Interpreter if installed (no TensorFlow import), else TensorFlow's"""
+    try:
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    if load_tensorflow() is not None:
+        return tf.lite.Interpreter
+    return None
+
+
+def tflite_path_for(model_path):
+    """trained_models/disease_cnn.h5 -> trained_models/disease_cnn.tflite"""
+    return f'{os.path.splitext(model_path)[0]}.tflite'
+
+
+class KerasBackend:
+    name = 'keras'
+
+    def __init__(self, model_path):
+        self.model = tf.keras.models.load_model(model_path)
+
+    def predict(self, batch):
+        return np.asarray(self.model.predict_on_batch(batch))
+
+
+class TFLiteBackend:
+    """
+    TFLite interpreter for a converted CNN. Quantized input/output tensors are
+    (de)quantized here, so callers always exchange float32 arrays.
+    Micro-batches vary in size from 1 to max_batch_size: each size gets its own
+    interpreter, planned once on first use, so no call pays for re-planning or for
+    padded rows. Larger batches run in max_batch_size chunks. Interpreters are not
+    thread-safe: calls are serialized (the CNN batcher already feeds them from a
+    single thread).
+    """
+    name = 'tflite'
+
+    def __init__(self, model_path, num_threads=None, interpreter_class=None, max_batch_size=1):
+        self.model_path = model_path
+        self.interpreter_class = interpreter_class or load_interpreter_class()
+        self.num_threads = num_threads
+        self.max_batch_size = max(1, int(max_batch_size))
+        self._interpreters = {}  # batch size -> (interpreter, input details, output details)
+        self._lock = threading.Lock()
+        # Single-image interpreter up front, so a bad artifact fails at load time
+        self._interpreter_for(1)
+
+    def _interpreter_for(self, batch_size):
+        entry = self._interpreters.get(batch_size)
+        if entry is None:
+            interpreter = self.interpreter_class(model_path=self.model_path, num_threads=self.num_threads)
+            details = interpreter.get_input_details()[0]
+            if details['shape'][0] != batch_size:
+                interpreter.resize_tensor_input(details['index'], [batch_size, *details['shape'][1:]])
+            interpreter.allocate_tensors()
+            entry = (interpreter, interpreter.get_input_details()[0], interpreter.get_output_details()[0])
+            self._interpreters[batch_size] = entry
+        return entry
+
+    def predict(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        outputs = []
+        with self._lock:
+            for start in range(0, len(batch), self.max_batch_size):
+                chunk = batch[start:start + self.max_batch_size]
+                interpreter, input_details, output_details = self._interpreter_for(len(chunk))
+                interpreter.set_tensor(input_details['index'], quantize(chunk, input_details))
+                interpreter.invoke()
+                outputs.append(dequantize(interpreter.get_tensor(output_details['index']), output_details))
+        return np.concatenate(outputs)
+
+
+def quantize(values, details):
+    """float32 -> the tensor's integer type using its (scale, zero_point); float tensors pass through"""
+    dtype = details['dtype']
+    if not np.issubdtype(dtype, np.integer):
+        return values.astype(dtype, copy=False)
+    scale, zero_point = details['quantization']
+    info = np.iinfo(dtype)
+    return np.clip(np.round(values / scale + zero_point), info.min, info.max).astype(dtype)
+
+
+def dequantize(values, details):
+    if not np.issubdtype(values.dtype, np.integer):
+        return values.astype(np.float32, copy=False)
+    scale, zero_point = details['quantization']
+    return (values.astype(np.float32) - zero_point) * scale
+
+
+def load_cnn_backend(model_path, backend=None, num_threads=None, max_batch_size=1):
+    """
+    Load the CNN for the requested backend ('keras' or 'tflite'; a .tflite path
+    implies 'tflite'). For 'tflite' with a Keras path, its converted sibling
+    (see convert_cnn.py) is used, falling back to Keras if there is none.
+    max_batch_size: largest batch the caller sends (the CNN batcher's limit).
+    Returns (backend, artifact path), or (None, None) if nothing can be loaded.
+    """
+    is_tflite_file = model_path.endswith('.tflite')
+    backend = 'tflite' if is_tflite_file else (backend or DEFAULT_CNN_BACKEND)
+
+    if backend == 'tflite':
+        tflite_path = model_path if is_tflite_file else tflite_path_for(model_path)
+        interpreter_class = load_interpreter_class() if os.path.exists(tflite_path) else None
+        if interpreter_class is not None:
+            return TFLiteBackend(tflite_path, num_threads, interpreter_class, max_batch_size), tflite_path
+        if is_tflite_file:
+            print("⚠️ Neither tflite_runtime nor TensorFlow is installed, CNN tier disabled")
+            return None, None
+        print(f"⚠️ No usable TFLite model at {tflite_path}, falling back to Keras")
+
+    if load_tensorflow() is None:
+        print("⚠️ TensorFlow not installed, CNN tier disabled")
+        return None, None
+    return KerasBackend(model_path), model_path
+
+
+def convert_to_tflite(model_path, output_path, quantization='float16', representative_inputs=None):
+    """
+    Convert a saved Keras model to TFLite.
+    quantization: 'none' (float32), 'float16' (half-size weights), 'dynamic'
+    (int8 weights, float activations) or 'int8' (weights and activations, calibrated
+    on representative_inputs: float32 arrays as produced by prepare_cnn_input).
+    """
+    if load_tensorflow() is None:
+        raise ImportError("TensorFlow is required to convert models")
+    converter = tf.lite.TFLiteConverter.from_keras_model(tf.keras.models.load_model(model_path))
+    if quantization != 'none':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == 'int8':
+        if representative_inputs is None:
+            raise ValueError("int8 quantization needs representative inputs for calibration")
+        converter.representative_dataset = lambda: ([np.expand_dims(x, 0).astype(np.float32)] for x in representative_inputs)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+
+    tmp_path = f'{output_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(converter.convert())
+    os.replace(tmp_path, output_path)
+    return output_path
@@ -0,0 +1,113 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class CNNBatcher:
+    """
+    Dynamic micro-batching for CNN inference.
+    Requests arriving within `max_latency_ms` of each other (up to
+    `max_batch_size` images) run as one batch; each caller gets its own row back.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=8, max_latency_ms=5):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_latency = max(0.0, float(max_latency_ms)) / 1000
+        self.queue = queue.Queue()
+        self.closed = False
+        self._submit_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.images = 0
+        self.largest_batch = 0
+        self.peak_queue_depth = 0
+
+        self._worker = threading.Thread(target=self._run, name='cnn-batcher', daemon=True)
+        self._worker.start()
+
+    def submit(self, model_input):
+        """Queue one preprocessed image; returns a Future with its prediction row"""
+        future = Future()
+        with self._submit_lock:
+            queued = not self.closed
+            if queued:
+                self.queue.put((model_input, future))
+        if not queued:
+            # Late caller still holding a retired model: predict unbatched on its own thread
+            try:
+                future.set_result(np.asarray(self.predict_fn(np.stack([model_input])))[0])
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        depth = self.queue.qsize()
+        with self._stats_lock:
+            self.peak_queue_depth = max(self.peak_queue_depth, depth)
+        return future
+
+    def predict(self, model_input, timeout=None):
+        return self.submit(model_input).result(timeout)
+
+    def close(self):
+        """Stop the worker once queued images are served; later submits run unbatched"""
+        with self._submit_lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.queue.put(None)
+        self._worker.join()
+
+    def _collect_batch(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_latency
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Put the shutdown marker back for the main loop
+                self.queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self.queue.get()
+            if first is None:
+                return
+
+            batch = self._collect_batch(first)
+            futures = [future for _, future in batch]
+            try:
+                outputs = np.asarray(self.predict_fn(np.stack([model_input for model_input, _ in batch])))
+                for future, output in zip(futures, outputs):
+                    future.set_result(output)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+
+            with self._stats_lock:
+                self.batches += 1
+                self.images += len(batch)
+                self.largest_batch = max(self.largest_batch, len(batch))
+
+    def stats(self):
+        """Queue depth and batching metrics for health reporting"""
+        with self._stats_lock:
+            return {
+                'queueDepth': self.queue.qsize(),
+                'peakQueueDepth': self.peak_queue_depth,
+                'batches': self.batches,
+                'images': self.images,
+                'avgBatchSize': round(self.images / self.batches, 2) if self.batches else 0,
+                'largestBatch': self.largest_batch,
+                'maxBatchSize': self.max_batch_size,
+                'maxLatencyMs': self.max_latency * 1000
+            }
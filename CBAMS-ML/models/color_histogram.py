@@ -0,0 +1,87 @@
+import cv2
+import numpy as np
+
+# HSV ranges on the OpenCV scale (H 0-180, S/V 0-255), inclusive like cv2.inRange
+COLOR_RANGES = {
+    # Disease indicators (DiseaseDetector)
+    'brown': ([10, 30, 20], [25, 255, 180]),     # Necrotic signs
+    'yellow': ([20, 40, 40], [35, 255, 255]),    # Chlorosis
+    'white': ([0, 0, 180], [180, 40, 255]),      # Powdery Mildew
+    'green': ([35, 40, 40], [85, 255, 255]),     # Healthy chlorophyll
+    # Health categories (CropHealthAnalyzer)
+    'healthy': ([40, 40, 40], [80, 255, 255]),   # Green HSV
+    'stressed': ([20, 40, 40], [40, 255, 255]),  # Yellow HSV
+    'diseased': ([0, 40, 40], [20, 255, 255])    # Red/Brown HSV
+}
+
+
+class HSVColorEngine:
+    """
+    Answers every color range query from a single histogram pass.
+    Each channel is bucketed only at the range boundaries, so the 3D histogram
+    stays tiny and summing one block of it gives exactly the cv2.inRange count.
+    """
+
+    def __init__(self, color_ranges=None):
+        self.color_ranges = color_ranges or COLOR_RANGES
+
+        edges = []
+        for channel in range(3):
+            channel_edges = {0, 256}
+            for lower, upper in self.color_ranges.values():
+                channel_edges.add(min(max(lower[channel], 0), 256))
+                channel_edges.add(min(max(upper[channel] + 1, 0), 256))
+            edges.append(sorted(channel_edges))
+
+        # Per-channel lookup table: pixel value -> bucket index
+        lut = np.zeros((256, 3), dtype=np.uint8)
+        for channel, channel_edges in enumerate(edges):
+            for bucket, (start, stop) in enumerate(zip(channel_edges[:-1], channel_edges[1:])):
+                lut[start:stop, channel] = bucket
+        self.lut = lut.reshape(1, 256, 3)
+        self.bins = [len(channel_edges) - 1 for channel_edges in edges]
+
+        # Histogram block covered by each named range
+        self.blocks = {}
+        for name, (lower, upper) in self.color_ranges.items():
+            self.blocks[name] = tuple(
+                slice(edges[c].index(min(max(lower[c], 0), 256)),
+                      edges[c].index(min(max(upper[c] + 1, 0), 256)))
+                for c in range(3)
+            )
+
+    def histogram(self, hsv_image):
+        """Bucket every pixel once and return a queryable ColorHistogram"""
+        bucketed = cv2.LUT(hsv_image, self.lut)
+        hist = cv2.calcHist(
+            [bucketed], [0, 1, 2], None, self.bins,
+            [0, self.bins[0], 0, self.bins[1], 0, self.bins[2]]
+        )
+        return ColorHistogram(self, hist.astype(np.float64), hsv_image.shape[0] * hsv_image.shape[1])
+
+
+class ColorHistogram:
+    """Bucketed HSV histogram of one image"""
+
+    def __init__(self, engine, hist, total_pixels):
+        self.engine = engine
+        self.hist = hist
+        self.total_pixels = total_pixels
+
+    def count(self, color):
+        if color not in self.engine.blocks:
+            return 0
+        return float(self.hist[self.engine.blocks[color]].sum())
+
+    def percentage(self, color):
+        if self.total_pixels == 0:
+            return 0
+        return (self.count(color) / self.total_pixels) * 100
+
+    def merge(self, other):
+        """Combine histograms of two image regions (e.g. tiles of one photo)"""
+        return ColorHistogram(self.engine, self.hist + other.hist, self.total_pixels + other.total_pixels)
+
+
+# Shared engine used by both analyzers
+color_engine = HSVColorEngine()
@@ -3,27 +3,45 @@ import numpy as np
 from PIL import Image
 import os
 
+from models.image_utils import decode_image, resize_for_analysis, iter_strips
+from models.color_histogram import COLOR_RANGES, color_engine
+from models.metrics import stage
+
 class CropHealthAnalyzer:
-    def __init__(self):
+    def __init__(self, analysis_max_side=None, tile_rows=None, analysis_pool=None):
+        # Optional downsampled analysis and strip-wise processing for large photos
+        self.analysis_max_side = analysis_max_side
+        self.tile_rows = tile_rows
+        # Optional AnalysisPool: run the analysis in a worker process
+        self.analysis_pool = analysis_pool
+        self.model_version = f"hsv/res:{analysis_max_side or 'full'}"
+        
+        # Green (healthy), yellow (stressed) and red/brown (diseased) HSV ranges
         self.color_ranges = {
-            'healthy': ([40, 40, 40], [80, 255, 255]),  # Green HSV
-            'stressed': ([20, 40, 40], [40, 255, 255]),  # Yellow HSV
-            'diseased': ([0, 40, 40], [20, 255, 255])    # Red/Brown HSV
+            category: COLOR_RANGES[category]
+            for category in ('healthy', 'stressed', 'diseased')
         }
     
-    def analyze_image(self, image_path, crop_type='unknown'):
-        """Analyze crop health from image"""
+    def analyze_image(self, image_source, crop_type='unknown'):
+        """Analyze crop health from upload bytes, a file path or a decoded BGR array"""
         # Load image
-        image = cv2.imread(image_path)
+        image = decode_image(image_source)
         
-        if image is None:
-            raise Exception("Failed to load image")
+        if self.analysis_pool:
+            return self.analysis_pool.analyze_health(image, crop_type)
         
-        # Convert to HSV
-        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        # Color percentages are resolution independent, so analyze at working size
+        image, _ = resize_for_analysis(image, self.analysis_max_side)
         
-        # Calculate color percentages
-        health_metrics = self.calculate_health_metrics(hsv)
+        with stage('color'):
+            if self.tile_rows:
+                health_metrics = self.calculate_health_metrics_strips(image)
+            else:
+                # Convert to HSV
+                hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+            
+                # Calculate color percentages
+                health_metrics = self.calculate_health_metrics(hsv)
         
         # Overall health score
         health_score = (
@@ -60,14 +78,21 @@ class CropHealthAnalyzer:
     
     def calculate_health_metrics(self, hsv_image):
         """Calculate percentage of healthy, stressed, and diseased areas"""
-        total_pixels = hsv_image.shape[0] * hsv_image.shape[1]
-        
+        # One histogram pass answers all three range queries
+        return self.metrics_from_histogram(color_engine.histogram(hsv_image))
+    
+    def calculate_health_metrics_strips(self, image):
+        """Same metrics, converting to HSV one strip at a time to bound memory"""
+        colors = None
+        for start, stop, _, _ in iter_strips(image.shape[0], self.tile_rows):
+            strip_colors = color_engine.histogram(cv2.cvtColor(image[start:stop], cv2.COLOR_BGR2HSV))
+            colors = strip_colors if colors is None else colors.merge(strip_colors)
+        return self.metrics_from_histogram(colors)
+    
+    def metrics_from_histogram(self, colors):
         metrics = {}
-        for category, (lower, upper) in self.color_ranges.items():
-            mask = cv2.inRange(hsv_image, np.array(lower), np.array(upper))
-            pixels = cv2.countNonZero(mask)
-            percentage = (pixels / total_pixels) * 100
-            metrics[f'{category}_percent'] = round(percentage, 2)
+        for category in self.color_ranges:
+            metrics[f'{category}_percent'] = round(colors.percentage(category), 2)
         
         return metrics
     
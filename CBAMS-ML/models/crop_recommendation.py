@@ -1,135 +1,222 @@
 import numpy as np
 import pandas as pd
-import pickle
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 import os
+import threading
+from datetime import datetime
+
+from models.model_store import load_model, save_model, as_backend, fit_parallel
+from models.dataset_store import dataset_exists, write_generated
+from models.incremental import incremental_update, load_checkpoint, read_dataset, save_checkpoint, saved_forest_params
+from models.result_cache import QuantizedPredictionCache
+from models import synthetic_data
+from models.metrics import stage
 
 class CropRecommendationModel:
-    def __init__(self):
+    DATASET_PATH = 'datasets/crop_recommendation.csv'
+    MODEL_PATH = 'trained_models/crop_model'
+    # Cache key rounding per feature: N, P, K, temperature, humidity, ph, rainfall
+    CACHE_RESOLUTIONS = [1, 1, 1, 0.1, 1, 0.1, 1]
+    # Forest hyperparameters for full training (train_forests.py sweeps alternatives)
+    FOREST_PARAMS = {'n_estimators': 100, 'random_state': 42}
+    TEST_SIZE = 0.2
+    
+    def __init__(self, backend=None, cache_size=4096, cache_resolutions=None, load=True):
         self.model = None
-        self.load_or_train_model()
+        self.backend = backend  # 'sklearn', 'flat' or 'hybrid' (see models/model_store.py)
+        self._train_lock = threading.RLock()
+        # Memoized predictions on quantized inputs (cache_size=0 disables)
+        self.cache = None
+        if cache_size:
+            self.cache = QuantizedPredictionCache(cache_resolutions or self.CACHE_RESOLUTIONS, cache_size)
+        # load=False leaves the model unset, e.g. for a caller that trains a new one
+        if load:
+            self.load_or_train_model()
     
     def load_or_train_model(self):
         """Load existing model or train new one"""
-        model_path = 'trained_models/crop_model.pkl'
+        self.model = load_model(self.MODEL_PATH, self.backend)
         
-        if os.path.exists(model_path):
-            with open(model_path, 'rb') as f:
-                self.model = pickle.load(f)
+        if self.model is not None:
             print("✅ Loaded existing crop recommendation model")
         else:
             print("⚠️ No model found. Training new model...")
             self.train_model()
     
-    def train_model(self):
-        """Train crop recommendation model"""
-        dataset_path = 'datasets/crop_recommendation.csv'
-        
-        if os.path.exists(dataset_path):
+    @classmethod
+    def forest_params(cls):
+        """FOREST_PARAMS, overridden by the parameters the saved model was trained with"""
+        return saved_forest_params(cls.MODEL_PATH, cls.FOREST_PARAMS)
+    
+    @classmethod
+    def load_training_data(cls):
+        """
+        Read the dataset (generating it first if missing) and split it for training.
+        Returns ((X_train, X_test, y_train, y_test), checkpoint).
+        """
+        dataset_path = cls.DATASET_PATH
+        
+        if dataset_exists(dataset_path):
             print(f"📁 Loading dataset from {dataset_path}...")
-            data = pd.read_csv(dataset_path)
         else:
             print("⚠️ No dataset file found. Generating initial dataset...")
-            data = self.generate_mock_data()
-            os.makedirs('datasets', exist_ok=True)
-            data.to_csv(dataset_path, index=False)
-            print(f"✅ Created new dataset file at {dataset_path}")
+            cls.create_dataset()
+        # Read back through the checkpointed reader: appended rows are picked up incrementally later
+        data, checkpoint = read_dataset(dataset_path, 'label')
         
         X = data.drop('label', axis=1)
         y = data['label']
         
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42
-        )
-        
-        self.model = RandomForestClassifier(n_estimators=100, random_state=42)
-        self.model.fit(X_train, y_train)
-        
-        accuracy = self.model.score(X_test, y_test)
-        print(f"✅ Model trained with accuracy: {accuracy * 100:.2f}%")
-        
-        # Save model
-        os.makedirs('trained_models', exist_ok=True)
-        with open('trained_models/crop_model.pkl', 'wb') as f:
-            pickle.dump(self.model, f)
+        split = train_test_split(X, y, test_size=cls.TEST_SIZE, random_state=42)
+        return split, checkpoint
+    
+    def train_model(self, params=None, n_jobs=None):
+        """
+        Train crop recommendation model.
+        params overrides forest_params() and is saved with the model, so later
+        full retrains keep it; trees are fitted on n_jobs cores (default ML_TRAIN_JOBS).
+        """
+        with self._train_lock:
+            (X_train, X_test, y_train, y_test), checkpoint = self.load_training_data()
+        
+            params = {**self.forest_params(), **(params or {})}
+            model = RandomForestClassifier(**params)
+            fit_parallel(model, X_train, y_train, n_jobs)
+        
+            accuracy = model.score(X_test, y_test)
+            print(f"✅ Model trained with accuracy: {accuracy * 100:.2f}%")
+        
+            # Save model (joblib + flat node arrays, the latter mmap-friendly)
+            save_model(model, self.MODEL_PATH)
+            checkpoint.update(baseRows=checkpoint['rows'], baseEstimators=model.n_estimators,
+                              nEstimators=model.n_estimators, forestParams=params,
+                              updatedAt=datetime.now().isoformat())
+            save_checkpoint(self.MODEL_PATH, checkpoint)
+            self.model = as_backend(model, self.MODEL_PATH, self.backend)
+        
+            # Cached probabilities came from the previous model
+            if self.cache:
+                self.cache.invalidate()
+
+    def train_incremental(self, min_rows=10):
+        """
+        Grow the forest with rows appended to the dataset since the last training,
+        then swap it in. Falls back to a full retrain when the dataset was rewritten,
+        has new labels, or the forest has grown too large.
+        """
+        with self._train_lock:
+            update = incremental_update(self.MODEL_PATH, self.DATASET_PATH, 'label', min_rows)
+            if update['status'] == 'retrain':
+                print(f"🔁 Full crop recommendation retrain: {update['reason']}")
+                self.train_model()
+                return {'status': 'retrained', 'reason': update['reason'], 'rows': load_checkpoint(self.MODEL_PATH)['rows']}
+            
+            if update['status'] == 'updated':
+                model = update.pop('model')
+                # Artifacts first, then the checkpoint (a crash in between leaves mismatched tree counts -> full retrain)
+                save_model(model, self.MODEL_PATH)
+                save_checkpoint(self.MODEL_PATH, update.pop('checkpoint'))
+                # Requests already running finish on the model they started with
+                self.model = as_backend(model, self.MODEL_PATH, self.backend)
+                if self.cache:
+                    self.cache.invalidate()
+                print(f"✅ Crop recommendation model grew by {update['addedEstimators']} trees from {update['newRows']} new rows")
+            return update
     
-    def generate_mock_data(self):
+    @classmethod
+    def create_dataset(cls, fmt=None):
+        """Generate the initial dataset, written straight to fmt (default ML_DATASET_FORMAT)"""
+        os.makedirs('datasets', exist_ok=True)
+        path = write_generated([cls.generate_mock_data()], cls.DATASET_PATH, fmt)
+        print(f"✅ Created new dataset file at {path}")
+        return path
+    
+    @staticmethod
+    def generate_mock_data(samples_per_crop=100, seed=42):
         """Generate realistic synthetic training data for 22 crops"""
-        np.random.seed(42)
-        n_samples_per_crop = 100
-        
-        crops = [
-            'rice', 'maize', 'chickpea', 'kidneybeans', 'pigeonpeas',
-            'mothbeans', 'mungbean', 'blackgram', 'lentil', 'pomegranate',
-            'banana', 'mango', 'grapes', 'watermelon', 'muskmelon', 'apple',
-            'orange', 'papaya', 'coconut', 'cotton', 'jute', 'coffee'
-        ]
-        
-        # Real-world approximate ranges for these crops
-        # N, P, K, temp, hum, ph, rain
-        crop_params = {
-            'rice': [(60, 100), (35, 60), (35, 45), (20, 27), (80, 85), (6.0, 7.0), (200, 300)],
-            'maize': [(60, 100), (35, 60), (15, 25), (18, 27), (55, 75), (5.5, 7.0), (60, 110)],
-            'cotton': [(100, 140), (40, 60), (15, 25), (22, 28), (75, 85), (7.0, 8.5), (60, 100)],
-            'coffee': [(80, 120), (15, 35), (25, 45), (23, 28), (50, 60), (6.0, 7.5), (140, 200)],
-            'banana': [(80, 120), (70, 95), (45, 55), (25, 30), (75, 85), (5.5, 6.5), (90, 110)],
-            # Simplified defaults for others to save space but maintain variety
-        }
-        
-        rows = []
-        for crop in crops:
-            params = crop_params.get(crop, [(20, 120), (20, 120), (10, 200), (15, 35), (30, 90), (5.0, 8.5), (40, 250)])
-            for _ in range(n_samples_per_crop):
-                row = {
-                    'N': np.random.uniform(*params[0]),
-                    'P': np.random.uniform(*params[1]),
-                    'K': np.random.uniform(*params[2]),
-                    'temperature': np.random.uniform(*params[3]),
-                    'humidity': np.random.uniform(*params[4]),
-                    'ph': np.random.uniform(*params[5]),
-                    'rainfall': np.random.uniform(*params[6]),
-                    'label': crop
-                }
-                rows.append(row)
-        
-        return pd.DataFrame(rows)
+        return synthetic_data.generate('crop', samples_per_crop * len(synthetic_data.CROPS), seed=seed)
+    
+    def build_features(self, records):
+        """Build the N x 7 feature matrix for a list of input records"""
+        # Prepare features (ensure keys match frontend/backend)
+        return np.array([[
+            float(record.get('nitrogen', 0)),
+            float(record.get('phosphorus', 0)),
+            float(record.get('potassium', 0)),
+            float(record.get('temperature', 25)),
+            float(record.get('humidity', 70)),
+            float(record.get('ph', 6.5)),
+            float(record.get('rainfall', 100))
+        ] for record in records], dtype=np.float64).reshape(-1, 7)
     
     def predict(self, input_data):
         """Predict best crops for given conditions"""
-        if self.model is None:
+        return self.predict_batch([input_data])[0]
+    
+    def predict_batch(self, records, top_k=3):
+        """Predict best crops for many records with a single predict_proba call"""
+        # Cache generation before the model: if a retrain swaps the model in meanwhile,
+        # rows computed with this one are not cached
+        generation = self.cache.generation if self.cache else None
+        model = self.model
+        if model is None:
             raise Exception("Model not loaded")
         
-        # Prepare features (ensure keys match frontend/backend)
-        features = np.array([[
-            float(input_data.get('nitrogen', 0)),
-            float(input_data.get('phosphorus', 0)),
-            float(input_data.get('potassium', 0)),
-            float(input_data.get('temperature', 25)),
-            float(input_data.get('humidity', 70)),
-            float(input_data.get('ph', 6.5)),
-            float(input_data.get('rainfall', 100))
-        ]])
-        
-        # Get prediction probabilities
-        probabilities = self.model.predict_proba(features)[0]
-        classes = self.model.classes_
-        
-        # Sort by probability
-        sorted_indices = np.argsort(probabilities)[::-1]
-        
-        recommendations = []
-        for i in sorted_indices[:3]:  # Top 3 recommendations
-            prob = probabilities[i]
-            if prob > 0.05:  # Only include if probability > 5%
-                crop_name = classes[i]
-                recommendations.append({
-                    'crop': crop_name.title(),
-                    'suitability': round(prob * 100, 2),
-                    'reason': self.get_suitability_reason(crop_name, input_data)
-                })
-        
-        return recommendations
+        if not records:
+            return []
+        
+        features = self.build_features(records)
+        
+        # Get prediction probabilities for every record at once
+        with stage('forest_predict'):
+            probabilities = self.predict_probabilities(model, features, generation)
+        classes = model.classes_
+        
+        # Vectorized top-k: partition, then sort only the k best columns per row
+        k = min(top_k, probabilities.shape[1])
+        top_indices = np.argpartition(probabilities, -k, axis=1)[:, -k:]
+        top_probs = np.take_along_axis(probabilities, top_indices, axis=1)
+        order = np.argsort(-top_probs, axis=1, kind='stable')
+        top_indices = np.take_along_axis(top_indices, order, axis=1)
+        top_probs = np.take_along_axis(top_probs, order, axis=1)
+        
+        results = []
+        for record, row_indices, row_probs in zip(records, top_indices, top_probs):
+            recommendations = []
+            for i, prob in zip(row_indices, row_probs):
+                if prob > 0.05:  # Only include if probability > 5%
+                    crop_name = classes[i]
+                    recommendations.append({
+                        'crop': crop_name.title(),
+                        'suitability': round(float(prob) * 100, 2),
+                        'reason': self.get_suitability_reason(crop_name, record)
+                    })
+            results.append(recommendations)
+        
+        return results
+    
+    def predict_probabilities(self, model, features, generation=None):
+        """
+        predict_proba through the quantized-input cache; misses run as one batch.
+        generation: cache generation read before `model` (stale rows are not stored)
+        """
+        if self.cache is None or not self.cache.cacheable(features):
+            return model.predict_proba(features)
+        
+        keys, snapped = self.cache.quantize(features)
+        # Look up each distinct key once (first row index stands in for duplicates)
+        first_index = {}
+        for i, key in enumerate(keys):
+            first_index.setdefault(key, i)
+        found = {key: self.cache.get(key) for key in first_index}
+        missing = [key for key, row in found.items() if row is None]
+        if missing:
+            computed = model.predict_proba(snapped[[first_index[key] for key in missing]])
+            for key, row in zip(missing, computed):
+                found[key] = row
+                self.cache.put(key, row, size=row.nbytes, generation=generation)
+        return np.vstack([found[key] for key in keys])
     
     def get_suitability_reason(self, crop, data):
         """Generate dynamic reason for crop suitability"""
@@ -0,0 +1,293 @@
+import csv
+import hashlib
+import io
+import itertools
+import json
+import os
+from datetime import datetime
+
+import pandas as pd
+
+# Columnar copies of the training CSVs. The CSV stays the source of truth (rows are
+# appended to it and incremental training checkpoints byte offsets into it); the
+# columnar file is converted from it once, in chunks, and reused while the CSV's
+# complete rows are unchanged. Features are stored as float32, text labels as
+# categoricals. A generated dataset is written straight to a columnar file of its
+# own (<name>.generated.<fmt>, marked 'generated' in its metadata) with no CSV.
+# A CSV created next to it later holds rows appended to the generated ones.
+COLUMNAR_FORMATS = ('parquet', 'feather')
+# Format written on conversion: 'parquet', 'feather' or 'csv' (no columnar copy)
+DEFAULT_FORMAT = os.environ.get('ML_DATASET_FORMAT', 'parquet')
+CHUNK_ROWS = int(os.environ.get('ML_DATASET_CHUNK_ROWS', 250_000))
+
+TAIL_BYTES = 4096  # bytes before a checkpoint offset that must be unchanged
+METADATA_KEY = b'cbams.source'
+
+# pyarrow is optional: without it training reads the CSV directly
+pa = None
+
+
+def load_pyarrow():
+    """Import pyarrow lazily, returning None if it is not installed"""
+    global pa
+    if pa is None:
+        try:
+            import pyarrow
+            import pyarrow.feather
+            import pyarrow.parquet
+            pa = pyarrow
+        except ImportError:
+            return None
+    return pa
+
+
+def tail_hash(data):
+    return hashlib.blake2b(data[-TAIL_BYTES:], digest_size=16).hexdigest()
+
+
+def columnar_path(dataset_path, fmt):
+    """datasets/crop_recommendation.csv -> datasets/crop_recommendation.parquet"""
+    return f'{os.path.splitext(dataset_path)[0]}.{fmt}'
+
+
+def source_state(dataset_path):
+    """
+    Identify the complete rows of a CSV without reading all of it: header, byte
+    offset of the end of the last complete line, and a hash of the bytes before it.
+    """
+    with open(dataset_path, 'rb') as f:
+        header = f.readline()
+        end = f.seek(0, os.SEEK_END)
+        # Scan back to the last newline (a half-appended line is not part of the dataset)
+        offset = 0
+        while end > 0:
+            start = max(0, end - 65536)
+            f.seek(start)
+            block = f.read(end - start)
+            newline = block.rfind(b'\n')
+            if newline >= 0:
+                offset = start + newline + 1
+                break
+            end = start
+        f.seek(max(0, offset - TAIL_BYTES))
+        tail = f.read(offset - f.tell())
+    return {
+        'dataset': dataset_path,
+        'header': header.decode('utf-8').strip(),
+        'offset': offset,
+        'tailHash': tail_hash(tail)
+    }
+
+
+class _PrefixReader(io.RawIOBase):
+    """The first `limit` bytes of a binary file"""
+
+    def __init__(self, f, limit):
+        self.f = f
+        self.remaining = limit
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.f.read(min(len(buffer), self.remaining))
+        buffer[:len(data)] = data
+        self.remaining -= len(data)
+        return len(data)
+
+
+def iter_csv_chunks(dataset_path, target, state, chunk_rows=None):
+    """Stream the complete rows of a CSV as DataFrames with float32 feature columns"""
+    columns = next(csv.reader([state['header']]))
+    dtypes = {column: 'float32' for column in columns if column != target}
+    with open(dataset_path, 'rb') as f:
+        prefix = io.BufferedReader(_PrefixReader(f, state['offset']))
+        yield from pd.read_csv(prefix, dtype=dtypes, chunksize=chunk_rows or CHUNK_ROWS)
+
+
+def convert_dataset(dataset_path, target, fmt=None, chunk_rows=None):
+    """
+    Write the columnar copy of a CSV (no-op if an up-to-date one exists).
+    The CSV is streamed in chunks, so memory stays bounded by chunk_rows.
+    Returns the columnar path, or None for fmt='csv' or without pyarrow.
+    """
+    fmt = fmt or DEFAULT_FORMAT
+    if fmt == 'csv' or load_pyarrow() is None:
+        return None
+    if fmt not in COLUMNAR_FORMATS:
+        raise ValueError(f"Unknown dataset format '{fmt}'")
+
+    state = source_state(dataset_path)
+    path = columnar_path(dataset_path, fmt)
+    if read_source_metadata(path, fmt) == state:
+        return path
+
+    print(f"🗜️ Converting {dataset_path} to {fmt}...")
+    chunks = iter_csv_chunks(dataset_path, target, state, chunk_rows)
+    rows = write_chunks(chunks, path, fmt, metadata={METADATA_KEY: json.dumps(state).encode('utf-8')})
+    return path if rows else None
+
+
+def write_chunks(chunks, path, fmt, metadata=None):
+    """
+    Stream DataFrame chunks to a CSV, Parquet (one row group per chunk) or Feather
+    file, replacing `path` atomically once complete. Returns the number of rows written.
+    """
+    if fmt != 'csv' and load_pyarrow() is None:
+        raise ImportError(f"pyarrow is required to write {fmt} files")
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    writer = schema = None
+    rows = 0
+    try:
+        for chunk in chunks:
+            if len(chunk) == 0:
+                continue
+            if fmt == 'csv':
+                chunk.to_csv(tmp_path, mode='w' if rows == 0 else 'a', header=rows == 0, index=False)
+                rows += len(chunk)
+                continue
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                schema = table.schema.with_metadata({**(table.schema.metadata or {}), **(metadata or {})})
+                if fmt == 'parquet':
+                    writer = pa.parquet.ParquetWriter(tmp_path, schema)
+                else:
+                    writer = pa.ipc.new_file(tmp_path, schema)
+            table = table.cast(schema)
+            if fmt == 'parquet':
+                writer.write_table(table)
+            else:
+                writer.write_table(table, max_chunksize=len(table))
+            rows += len(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    if rows == 0:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return 0
+    os.replace(tmp_path, path)
+    return rows
+
+
+def generated_path(dataset_path, fmt):
+    """datasets/crop_recommendation.csv -> datasets/crop_recommendation.generated.parquet"""
+    return f'{os.path.splitext(dataset_path)[0]}.generated.{fmt}'
+
+
+def write_generated(chunks, dataset_path, fmt=None):
+    """
+    Write a generated dataset straight to a columnar file, skipping the CSV write
+    and parse (or to dataset_path itself for fmt='csv' / without pyarrow).
+    Returns the path written.
+    """
+    fmt = fmt or DEFAULT_FORMAT
+    if fmt == 'csv' or load_pyarrow() is None:
+        write_chunks(chunks, dataset_path, 'csv')
+        return dataset_path
+    if fmt not in COLUMNAR_FORMATS:
+        raise ValueError(f"Unknown dataset format '{fmt}'")
+    chunks = iter(chunks)
+    first = next(chunks)
+    path = generated_path(dataset_path, fmt)
+    # Same header a CSV of these rows would have, so a CSV added later can be checked against it
+    state = {'dataset': path, 'generated': datetime.now().isoformat(), 'header': ','.join(first.columns)}
+    write_chunks(itertools.chain([first], chunks), path, fmt,
+                 metadata={METADATA_KEY: json.dumps(state).encode('utf-8')})
+    return path
+
+
+def generated_dataset(dataset_path):
+    """(path, state) of a dataset generated in columnar form, or (None, None)"""
+    for fmt in COLUMNAR_FORMATS:
+        path = generated_path(dataset_path, fmt)
+        state = read_source_metadata(path, fmt)
+        if state and state.get('generated'):
+            return path, state
+    return None, None
+
+
+def dataset_exists(dataset_path):
+    return os.path.exists(dataset_path) or generated_dataset(dataset_path)[0] is not None
+
+
+def read_source_metadata(path, fmt):
+    """Source state recorded in a columnar file, or None if it is missing or unreadable"""
+    if load_pyarrow() is None or not os.path.exists(path):
+        return None
+    try:
+        if fmt == 'parquet':
+            schema = pa.parquet.read_schema(path)
+        else:
+            with pa.memory_map(path) as source:
+                schema = pa.ipc.open_file(source).schema
+        return json.loads((schema.metadata or {})[METADATA_KEY])
+    except (OSError, KeyError, ValueError, pa.ArrowException):
+        return None
+
+
+def read_columnar(dataset_path, target, state):
+    """
+    Load a columnar copy matching the CSV's current state, as a DataFrame with
+    float32 features and a categorical (text) target. Returns None if there is none.
+    """
+    if load_pyarrow() is None:
+        return None
+    for fmt in COLUMNAR_FORMATS:
+        path = columnar_path(dataset_path, fmt)
+        if read_source_metadata(path, fmt) == state:
+            return read_table(path, fmt, target)
+    return None
+
+
+def read_table(path, fmt, target):
+    if fmt == 'parquet':
+        table = pa.parquet.read_table(path)
+    else:
+        table = pa.feather.read_table(path, memory_map=True)
+    return as_categorical(table.to_pandas(), target)
+
+
+def as_categorical(frame, target):
+    """Text target column as a categorical"""
+    if target in frame and frame[target].dtype == object:
+        frame[target] = frame[target].astype('category')
+    return frame
+
+
+def read_generated(dataset_path, target):
+    """(DataFrame, state) of a generated columnar dataset, or (None, None)"""
+    path, state = generated_dataset(dataset_path)
+    if path is None or load_pyarrow() is None:
+        return None, None
+    return read_table(path, os.path.splitext(path)[1].lstrip('.'), target), state
+
+
+def load_dataset(dataset_path, target, fmt=None):
+    """
+    Load the complete rows of a training CSV through its columnar copy, converting
+    it first if the CSV changed. Returns (DataFrame, source state); falls back to
+    reading the CSV in chunks when the format is 'csv' or pyarrow is missing.
+    A generated columnar dataset is read directly; a CSV next to it holds rows
+    appended to it (the state then records the generated file under 'base').
+    """
+    base, base_state = read_generated(dataset_path, target)
+    if not os.path.exists(dataset_path):
+        if base is None:
+            raise FileNotFoundError(f"No dataset at {dataset_path}")
+        return base, base_state
+    state = source_state(dataset_path)
+    frame = read_columnar(dataset_path, target, state)
+    if frame is None and convert_dataset(dataset_path, target, fmt):
+        frame = read_columnar(dataset_path, target, state)
+    if frame is None:
+        chunks = list(iter_csv_chunks(dataset_path, target, state))
+        if not chunks:
+            chunks = [pd.DataFrame(columns=next(csv.reader([state['header']])))]
+        frame = as_categorical(pd.concat(chunks, ignore_index=True), target)
+    if base is not None:
+        if state['header'] != base_state['header']:
+            raise ValueError(f"{dataset_path} columns do not match the generated dataset {base_state['dataset']}")
+        frame = as_categorical(pd.concat([base, frame], ignore_index=True), target) if len(frame) else base
+        state = dict(state, base=base_state)
+    return frame, state
@@ -2,22 +2,56 @@ import cv2
 import numpy as np
 from PIL import Image
 import os
+import threading
 
-try:
-    import tensorflow as tf
-    HAS_TENSORFLOW = True
-except ImportError:
-    HAS_TENSORFLOW = False
+from models.image_utils import decode_image, prepare_cnn_input, resize_for_analysis, iter_strips
+from models.color_histogram import color_engine
+from models.spot_analysis import SpotStats, spot_engine
+from models.cnn_batcher import CNNBatcher
+from models.cnn_backends import load_cnn_backend
+from models.metrics import stage
+
+# Early-exit screen: an image is decisively healthy when every signal measured on the
+# thumbnail stays below its limit. Colors and 'dark' (candidate-lesion pixels, the spot
+# mask's threshold) are percent coverage; 'spots' counts dark regions, which small
+# scattered lesions (bacterial blight) trip long before they add up to any coverage.
+# check_cascade_consistency.py verifies the limits against the full pipeline.
+CASCADE_THRESHOLDS = {'brown': 2.0, 'yellow': 4.0, 'white': 2.0, 'dark': 0.5, 'spots': 1}
 
 class DiseaseDetector:
-    def __init__(self, model_path=None):
+    def __init__(self, model_path=None, analysis_max_side=None, tile_rows=None,
+                 cnn_batch_size=1, cnn_batch_window_ms=5, analysis_pool=None,
+                 cnn_backend=None, cnn_threads=None, cascade=False, cascade_side=256,
+                 cascade_thresholds=None):
         """
         Dual-Tier Disease Detector
         Tier 1A: Heuristic Pixel Analysis (Fast, deterministic)
         Tier 1B: CNN Deep Learning (Pattern matching, feature extraction)
+        analysis_max_side: downsample Tier 1A work to this longest side (None = full resolution)
+        tile_rows: process Tier 1A in horizontal strips of this many rows to bound peak memory
+        cnn_batch_size / cnn_batch_window_ms: micro-batch concurrent Tier 1B requests
+        analysis_pool: optional AnalysisPool running Tier 1A in worker processes
+        cnn_backend / cnn_threads: 'keras' or 'tflite' (converted model, see convert_cnn.py)
+        and the TFLite interpreter's thread count
+        cascade: screen a cascade_side thumbnail first and skip the contour, Laplacian
+        and CNN stages for decisively healthy leaves (cascade_thresholds override
+        CASCADE_THRESHOLDS)
         """
         self.HAS_CNN = False
         self.model = None
+        cnn_path = None
+        self.batcher = None
+        self.analysis_max_side = analysis_max_side
+        self.tile_rows = tile_rows
+        self.analysis_pool = analysis_pool
+        self.min_spot_area = 50  # px at full resolution, rescaled with the analysis size
+        self.cascade = cascade
+        self.cascade_side = cascade_side
+        self.cascade_thresholds = {**CASCADE_THRESHOLDS, **(cascade_thresholds or {})}
+        self._cascade_lock = threading.Lock()
+        self.screened = 0
+        self.early_exits = 0
+        self.escalated_by = {name: 0 for name in self.cascade_thresholds}
         
         # 1. Initialize Disease categories
         self.diseases = {
@@ -49,37 +83,57 @@ class DiseaseDetector:
         }
 
         # 2. Try to load Pre-trained CNN (Tier 1B)
-        if HAS_TENSORFLOW:
-            try:
-                if model_path and os.path.exists(model_path):
-                    print(f"📦 Loading custom CNN model from {model_path}...")
-                    self.model = tf.keras.models.load_model(model_path)
-                    self.HAS_CNN = True
-                else:
-                    print("🚀 Using MobileNetV2 for feature validation (No local custom model found)")
-                    # We can load a lightweight MobileNetV2 if needed, 
-                    # but for this script we'll use a validated feature extractor
-                    self.HAS_CNN = False # Set to false if you don't have a final plant-specific h5
-            except Exception as e:
-                print(f"⚠️ CNN Load warning: {e}")
-
-    def detect(self, image_path):
+        try:
+            if model_path and os.path.exists(model_path):
+                print(f"📦 Loading custom CNN model from {model_path}...")
+                self.model, cnn_path = load_cnn_backend(model_path, cnn_backend, cnn_threads, cnn_batch_size)
+                self.HAS_CNN = self.model is not None
+            else:
+                print("🚀 Using MobileNetV2 for feature validation (No local custom model found)")
+                # We can load a lightweight MobileNetV2 if needed, 
+                # but for this script we'll use a validated feature extractor
+                self.HAS_CNN = False # Set to false if you don't have a final plant-specific h5
+        except Exception as e:
+            print(f"⚠️ CNN Load warning: {e}")
+
+        # Identifies the models and analysis resolution behind a result (used in cache keys)
+        self.model_version = 'heuristic'
+        if self.HAS_CNN:
+            self.model_version = f"cnn:{self.model.name}:{os.path.basename(cnn_path)}@{int(os.path.getmtime(cnn_path))}"
+        self.model_version += f"/res:{analysis_max_side or 'full'}"
+        if self.cascade:
+            limits = ','.join(f'{name[0]}{limit:g}' for name, limit in sorted(self.cascade_thresholds.items()))
+            self.model_version += f"/cascade:{cascade_side}:{limits}"
+
+        # 3. Micro-batch concurrent CNN requests through one model call
+        if self.HAS_CNN and cnn_batch_size > 1:
+            self.batcher = CNNBatcher(self.predict_cnn_batch, cnn_batch_size, cnn_batch_window_ms)
+
+    def detect(self, image_source):
         """
         RUN DUAL-TIER LOCAL ANALYSIS
+        image_source: upload bytes, file path or decoded BGR array
         """
         try:
-            # Load image
-            image = cv2.imread(image_path)
-            if image is None:
-                raise Exception("Failed to load image")
+            # Decode once; both tiers share the same array
+            image = decode_image(image_source)
+            
+            # --- CASCADE: cheap thumbnail screen, exit early on clearly healthy leaves ---
+            if self.cascade:
+                screen = self.screen_image(image)
+                if screen['decisive']:
+                    return self.early_exit_result(screen)
             
             # --- TIER 1A: HEURISTIC PIXEL ANALYSIS ---
             # Analyze image for pixel-level disease indicators (Heuristics)
-            pixel_analysis = self.analyze_disease_indicators(image)
+            if self.analysis_pool:
+                pixel_analysis = self.analysis_pool.disease_indicators(image)
+            else:
+                pixel_analysis = self.analyze_disease_indicators(image)
             
             # --- TIER 1B: CNN INFERENCE (IF AVAILABLE) ---
             if self.HAS_CNN:
-                cnn_result, cnn_confidence = self.predict_cnn(image_path)
+                cnn_result, cnn_confidence = self.predict_cnn(image)
                 final_disease = self.merge_tier_results(pixel_analysis, cnn_result, cnn_confidence)
             else:
                 # Fallback to smart heuristic classification
@@ -102,25 +156,98 @@ class DiseaseDetector:
                 'disease': self.diseases['healthy']
             }
 
-    def predict_cnn(self, image_path):
+    def screen_image(self, image):
+        """
+        Color coverage and dark spot count of a low-resolution thumbnail, compared to
+        the cascade limits. Returns the signals, whether they are decisively healthy,
+        and which limits were exceeded.
+        """
+        with stage('screen'):
+            thumbnail, _ = resize_for_analysis(image, self.cascade_side)
+            colors = color_engine.histogram(cv2.cvtColor(thumbnail, cv2.COLOR_BGR2HSV))
+            gray = cv2.cvtColor(thumbnail, cv2.COLOR_BGR2GRAY)
+            signals = {color: colors.percentage(color) for color in ('brown', 'yellow', 'white')}
+            # No blur: the area-averaging downscale already smooths sensor noise, and a
+            # blur would wash out lesions only a pixel or two wide at this size
+            dark = (gray < 100).astype(np.uint8)
+            signals['dark'] = np.count_nonzero(dark) * 100 / max(1, dark.size)
+            signals['spots'] = cv2.connectedComponents(dark, connectivity=8)[0] - 1
+        
+        exceeded = [name for name, limit in self.cascade_thresholds.items() if signals.get(name, 0) >= limit]
+        with self._cascade_lock:
+            self.screened += 1
+            if exceeded:
+                for name in exceeded:
+                    self.escalated_by[name] += 1
+            else:
+                self.early_exits += 1
+        return {'signals': signals, 'decisive': not exceeded, 'exceeded': exceeded}
+
+    def early_exit_result(self, screen):
+        """Healthy result from the screen alone (contours, Laplacian and CNN skipped)"""
+        signals = screen['signals']
+        pixel_analysis = {
+            # No dark regions on the thumbnail: no lesion-sized spots to count
+            **SpotStats([], 0, self.min_spot_area).as_analysis(),
+            'texture_variance': None,
+            'brown_percentage': signals['brown'],
+            'yellow_percentage': signals['yellow'],
+            'white_percentage': signals['white']
+        }
+        final_disease = self.diseases['healthy'].copy()
+        final_disease['key'] = 'healthy'
+        final_disease['confidence'] = 98
+        return {
+            'diseaseDetected': False,
+            'disease': final_disease,
+            'severity': self.calculate_severity(pixel_analysis),
+            'recommendations': self.get_recommendations(final_disease),
+            'confidence': final_disease['confidence'],
+            'analysisTier': 'Cascade (early exit)',
+            'screen': {name: round(value, 2) for name, value in signals.items()}
+        }
+
+    def cascade_stats(self):
+        """Early-exit and per-stage skip rates, for tuning the cascade thresholds"""
+        if not self.cascade:
+            return None
+        with self._cascade_lock:
+            screened, exits = self.screened, self.early_exits
+            escalated_by = dict(self.escalated_by)
+        rate = round(exits / screened, 4) if screened else 0.0
+        return {
+            'screened': screened,
+            'earlyExits': exits,
+            'escalated': screened - exits,
+            # Images escalated because each limit was exceeded (one image can exceed several)
+            'escalatedBy': escalated_by,
+            'skipRates': {'contours': rate, 'laplacian': rate, 'cnn': rate if self.HAS_CNN else None},
+            'thresholds': self.cascade_thresholds,
+            'screenSide': self.cascade_side
+        }
+
+    def predict_cnn(self, image):
         """
         Simulated CNN Inference using MobileNetV2 preprocessing logic
         (In a real production system, load your actual trained .h5 model)
+        image: decoded BGR array (a path or bytes is decoded first)
         """
         if not self.HAS_CNN:
             return None, 0
             
         try:
-            # Preprocess image
-            img = tf.keras.preprocessing.image.load_img(image_path, target_size=(224, 224))
-            img_array = tf.keras.preprocessing.image.img_to_array(img)
-            img_array = tf.expand_dims(img_array, 0)
-            img_array = tf.keras.applications.mobilenet_v2.preprocess_input(img_array)
+            image = decode_image(image)
+            with stage('cnn'):
+                # Preprocess the already decoded image (no second file read/decode)
+                img_input = prepare_cnn_input(image)
 
-            # Predict
-            predictions = self.model.predict(img_array)
-            class_idx = np.argmax(predictions[0])
-            confidence = float(np.max(predictions[0]))
+                # Predict (batched with concurrent requests when enabled)
+                if self.batcher:
+                    prediction = self.batcher.predict(img_input)
+                else:
+                    prediction = self.model.predict(np.expand_dims(img_input, 0))[0]
+            class_idx = np.argmax(prediction)
+            confidence = float(np.max(prediction))
 
             # Map the class index to your defined diseases
             class_map = list(self.diseases.keys())
@@ -132,6 +259,18 @@ class DiseaseDetector:
             print(f"CNN Prediction Error: {e}")
             return None, 0
 
+    def predict_cnn_batch(self, img_inputs):
+        """Run a stacked batch of preprocessed images through the CNN in one call"""
+        return self.model.predict(img_inputs)
+
+    def batching_stats(self):
+        return self.batcher.stats() if self.batcher else None
+
+    def close(self):
+        """Stop the CNN batcher thread (the shared analysis pool is left running)"""
+        if self.batcher:
+            self.batcher.close()
+
     def merge_tier_results(self, pixel_analysis, cnn_result, cnn_confidence):
         """
         Aggregates results from both Tiers using a weighted validation.
@@ -156,31 +295,114 @@ class DiseaseDetector:
 
     def analyze_disease_indicators(self, image):
         """Analyze image for pixel-level disease indicators using HSV and Laplacian"""
-        # Convert to different color spaces
-        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        # Optional analysis resolution: spot areas shrink with the pixel count
+        work_image, area_ratio = resize_for_analysis(image, self.analysis_max_side)
+        min_spot_area = self.min_spot_area * area_ratio
+        # Laplacian variance is not scale invariant, so a downsampled analysis
+        # measures texture on the full resolution grayscale (strip by strip) instead
+        downscaled = work_image is not image
         
-        # Detect spots and abnormalities (Tier 1A)
-        spots = self.detect_spots(gray)
+        if self.tile_rows:
+            colors, spot_mask, texture = self.scan_strips(work_image, texture=not downscaled)
+        else:
+            # Convert to different color spaces
+            with stage('contours'):
+                gray = cv2.cvtColor(work_image, cv2.COLOR_BGR2GRAY)
+                spot_mask = self.spot_mask(gray)
+            # Measure surface texture variance
+            if not downscaled:
+                with stage('laplacian'):
+                    texture = self.analyze_texture(gray)
+            # One histogram pass answers every color query
+            with stage('color'):
+                hsv = cv2.cvtColor(work_image, cv2.COLOR_BGR2HSV)
+                colors = color_engine.histogram(hsv)
         
-        # Measure surface texture variance
-        texture = self.analyze_texture(gray)
+        if downscaled:
+            texture = self.texture_variance_strips(image)
+        
+        # Detect spots and abnormalities (Tier 1A)
+        with stage('contours'):
+            spots = self.analyze_spots(spot_mask, min_spot_area, area_ratio)
         
         return {
-            'spots_detected': spots,
+            **spots.as_analysis(),
             'texture_variance': texture,
-            'brown_percentage': self.calculate_color_percentage(hsv, 'brown'),
-            'yellow_percentage': self.calculate_color_percentage(hsv, 'yellow'),
-            'white_percentage': self.calculate_color_percentage(hsv, 'white')
+            'brown_percentage': colors.percentage('brown'),
+            'yellow_percentage': colors.percentage('yellow'),
+            'white_percentage': colors.percentage('white')
         }
 
-    def detect_spots(self, gray_image):
-        """Spot Identification using Thresholding and Contours"""
+    def scan_strips(self, image, texture=True):
+        """
+        Tiled Tier 1A pass: color histogram, spot mask and Laplacian variance
+        computed strip by strip, so only one strip of HSV/blur/Laplacian
+        temporaries is alive at a time. Results match the full-image pass.
+        texture=False skips the Laplacian (the variance comes back as None).
+        """
+        height = image.shape[0]
+        spot_mask = np.empty(image.shape[:2], dtype=np.uint8)
+        colors = None
+        lap_stats = np.zeros(3)
+        
+        # 2 halo rows cover the 5x5 blur and the 3x3 Laplacian
+        for start, stop, pad_start, pad_stop in iter_strips(height, self.tile_rows, halo=2):
+            core = slice(start - pad_start, stop - pad_start)
+            with stage('contours'):
+                gray = cv2.cvtColor(image[pad_start:pad_stop], cv2.COLOR_BGR2GRAY)
+                spot_mask[start:stop] = self.spot_mask(gray)[core]
+            if texture:
+                with stage('laplacian'):
+                    lap_stats += self.laplacian_stats(gray, core)
+            
+            with stage('color'):
+                strip_colors = color_engine.histogram(cv2.cvtColor(image[start:stop], cv2.COLOR_BGR2HSV))
+                colors = strip_colors if colors is None else colors.merge(strip_colors)
+        
+        return colors, spot_mask, self.variance_from_stats(lap_stats) if texture else None
+
+    def texture_variance_strips(self, image):
+        """Full resolution Laplacian variance accumulated over strips"""
+        rows = self.tile_rows or 512
+        lap_stats = np.zeros(3)
+        with stage('laplacian'):
+            for start, stop, pad_start, pad_stop in iter_strips(image.shape[0], rows, halo=1):
+                gray = cv2.cvtColor(image[pad_start:pad_stop], cv2.COLOR_BGR2GRAY)
+                lap_stats += self.laplacian_stats(gray, slice(start - pad_start, stop - pad_start))
+        return self.variance_from_stats(lap_stats)
+
+    def laplacian_stats(self, gray_strip, core):
+        """(count, sum, sum of squares) of the Laplacian over the strip's own rows"""
+        # 8-bit input keeps the 3x3 Laplacian within int16, exactly
+        values = cv2.Laplacian(gray_strip, cv2.CV_16S)[core].ravel().astype(np.float64)
+        return np.array([values.size, values.sum(), values @ values])
+
+    def variance_from_stats(self, stats):
+        count, total, total_sq = stats
+        if count == 0:
+            return 0.0
+        mean = total / count
+        return float(total_sq / count - mean * mean)
+
+    def detect_spots(self, gray_image, min_area=None):
+        """Spot Identification using Thresholding and Connected Components"""
+        return self.count_spots(self.spot_mask(gray_image), min_area)
+
+    def spot_mask(self, gray_image):
+        """Binary mask of dark regions (candidate lesions)"""
         blurred = cv2.GaussianBlur(gray_image, (5, 5), 0)
         _, thresh = cv2.threshold(blurred, 100, 255, cv2.THRESH_BINARY_INV)
-        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        significant_spots = len([c for c in contours if cv2.contourArea(c) > 50])
-        return significant_spots
+        return thresh
+
+    def count_spots(self, mask, min_area=None):
+        """Count connected regions larger than min_area pixels"""
+        return self.analyze_spots(mask, min_area).count
+
+    def analyze_spots(self, mask, min_area=None, area_ratio=1.0):
+        """Count, sizes and density of the spots larger than min_area mask pixels"""
+        if min_area is None:
+            min_area = self.min_spot_area
+        return spot_engine.analyze(mask, min_area, area_ratio)
 
     def analyze_texture(self, gray_image):
         """Laplacian Variance for texture measuring"""
@@ -189,19 +411,8 @@ class DiseaseDetector:
 
     def calculate_color_percentage(self, hsv_image, color):
         """Segment image by color ranges and calculate percentage of abnormal tissue"""
-        color_ranges = {
-            'brown': ([10, 30, 20], [25, 255, 180]),    # Necrotic signs
-            'yellow': ([20, 40, 40], [35, 255, 255]),   # Chlorosis
-            'white': ([0, 0, 180], [180, 40, 255]),     # Powdery Mildew
-            'green': ([35, 40, 40], [85, 255, 255])     # Healthy chlorophyll
-        }
-        
-        if color not in color_ranges: return 0
-        lower, upper = color_ranges[color]
-        mask = cv2.inRange(hsv_image, np.array(lower), np.array(upper))
-        total_pixels = hsv_image.shape[0] * hsv_image.shape[1]
-        color_pixels = cv2.countNonZero(mask)
-        return (color_pixels / total_pixels) * 100
+        # Brown (necrotic), yellow (chlorosis), white (powdery mildew), green (healthy)
+        return color_engine.histogram(hsv_image).percentage(color)
 
     def classify_disease_heuristically(self, analysis):
         """
@@ -0,0 +1,176 @@
+import json
+import os
+
+import numpy as np
+
+# Node arrays of all trees, concatenated; child indices are global (-1 = leaf)
+ARRAY_NAMES = ('children_left', 'children_right', 'feature', 'threshold', 'value', 'roots')
+
+
+class FlatForest:
+    """
+    Random forest exported to flat NumPy node arrays.
+    Saved as plain .npy files and loaded with mmap, so pre-forked workers share
+    one read-only copy of the trees through the page cache. Evaluation walks all
+    trees for all rows at once with NumPy, avoiding sklearn's per-tree dispatch.
+    Predictions follow sklearn exactly (float32 features, trees accumulated in order).
+    """
+
+    MAX_PATHS = 200_000  # tree/row pairs traversed at once
+
+    def __init__(self, arrays, classes=None, n_features=None):
+        self.children_left = arrays['children_left']
+        self.children_right = arrays['children_right']
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.value = arrays['value']
+        self.roots = arrays['roots']
+        self.classes_ = None if classes is None else np.asarray(classes, dtype=object)
+        self.n_features_in_ = n_features
+        self.n_estimators = len(self.roots)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Flatten a fitted RandomForestClassifier / RandomForestRegressor"""
+        is_classifier = hasattr(model, 'classes_')
+        left, right, feature, threshold, value, roots = [], [], [], [], [], []
+        offset = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            roots.append(offset)
+            # Shift child pointers into the concatenated node space, keep leaves at -1
+            left.append(np.where(tree.children_left == -1, -1, tree.children_left + offset))
+            right.append(np.where(tree.children_right == -1, -1, tree.children_right + offset))
+            feature.append(tree.feature)
+            threshold.append(tree.threshold)
+            if is_classifier:
+                # Per-tree class probabilities, normalized the way DecisionTreeClassifier does
+                counts = tree.value[:, 0, :len(model.classes_)]
+                normalizer = counts.sum(axis=1)[:, np.newaxis]
+                normalizer[normalizer == 0.0] = 1.0
+                value.append(counts / normalizer)
+            else:
+                value.append(tree.value[:, 0, 0])
+            offset += tree.node_count
+
+        arrays = {
+            'children_left': np.concatenate(left).astype(np.int32),
+            'children_right': np.concatenate(right).astype(np.int32),
+            'feature': np.concatenate(feature).astype(np.int32),
+            'threshold': np.concatenate(threshold).astype(np.float64),
+            'value': np.concatenate(value).astype(np.float64),
+            'roots': np.array(roots, dtype=np.int32)
+        }
+        classes = list(model.classes_) if is_classifier else None
+        return cls(arrays, classes, model.n_features_in_)
+
+    def save(self, directory):
+        """Write one .npy per array plus meta.json (written last, marks a complete export)"""
+        os.makedirs(directory, exist_ok=True)
+        for name in ARRAY_NAMES:
+            tmp_path = os.path.join(directory, f'{name}.{os.getpid()}.tmp.npy')
+            np.save(tmp_path, getattr(self, name))
+            os.replace(tmp_path, os.path.join(directory, f'{name}.npy'))
+
+        meta = {
+            'kind': 'classifier' if self.classes_ is not None else 'regressor',
+            'classes': None if self.classes_ is None else [str(c) for c in self.classes_],
+            'n_features': self.n_features_in_,
+            'n_estimators': self.n_estimators
+        }
+        tmp_meta = os.path.join(directory, f'meta.json.{os.getpid()}.tmp')
+        with open(tmp_meta, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_meta, os.path.join(directory, 'meta.json'))
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r' if mmap else None)
+            for name in ARRAY_NAMES
+        }
+        return cls(arrays, meta['classes'], meta['n_features'])
+
+    @staticmethod
+    def exists(directory):
+        return os.path.exists(os.path.join(directory, 'meta.json'))
+
+    def _prepare(self, X):
+        # sklearn evaluates splits on float32 features
+        X = np.asarray(X, dtype=np.float32)
+        return X.reshape(1, -1) if X.ndim == 1 else X
+
+    def apply(self, X):
+        """
+        Leaf node reached by every row in every tree, shape (n_trees, n_rows).
+        All trees advance together one level per step; finished paths drop out
+        of the active set, so the work per step shrinks as rows reach leaves.
+        """
+        n_rows, n_features = X.shape
+        flat_X = X.ravel()
+        node = np.repeat(np.asarray(self.roots, dtype=np.int32), n_rows)
+        row_offset = np.tile(np.arange(n_rows, dtype=np.int32) * n_features, self.n_estimators)
+        active = np.arange(node.size, dtype=np.int32)
+        current = node
+        while active.size:
+            internal = self.children_left[current] != -1
+            active, current = active[internal], current[internal]
+            go_left = flat_X[row_offset[active] + self.feature[current]] <= self.threshold[current]
+            current = np.where(go_left, self.children_left[current], self.children_right[current])
+            node[active] = current
+        return node.reshape(self.n_estimators, n_rows)
+
+    def _accumulate(self, X):
+        X = np.ascontiguousarray(self._prepare(X))
+        # Bound the (trees x rows) working set for large batches
+        chunk_size = max(1, self.MAX_PATHS // max(1, self.n_estimators))
+        results = []
+        for start in range(0, X.shape[0], chunk_size):
+            leaves = self.apply(X[start:start + chunk_size])
+            # Trees are added strictly in order, matching sklearn's accumulation bit for bit
+            if leaves.shape[1] <= 8:
+                total = np.cumsum(self.value[leaves], axis=0)[-1]
+            else:
+                total = self.value[leaves[0]].copy()
+                for tree_leaves in leaves[1:]:
+                    total += self.value[tree_leaves]
+            results.append(total / self.n_estimators)
+        if not results:
+            return np.zeros((0,) + self.value.shape[1:])
+        return np.concatenate(results)
+
+    def predict_proba(self, X):
+        if self.classes_ is None:
+            raise AttributeError("predict_proba is only available for classifiers")
+        return self._accumulate(X)
+
+    def predict(self, X):
+        result = self._accumulate(X)
+        if self.classes_ is None:
+            return result
+        return self.classes_[np.argmax(result, axis=1)]
+
+
+class HybridForest:
+    """
+    Serves small batches from the flat engine (no per-tree dispatch overhead)
+    and large batches from sklearn, whose compiled traversal wins at scale.
+    """
+
+    def __init__(self, model, flat, max_flat_rows=1000):
+        self.model = model
+        self.flat = flat
+        self.max_flat_rows = max_flat_rows
+        self.classes_ = getattr(model, 'classes_', None)
+        self.n_features_in_ = model.n_features_in_
+
+    def _backend(self, X):
+        return self.flat if len(X) <= self.max_flat_rows else self.model
+
+    def predict_proba(self, X):
+        return self._backend(X).predict_proba(X)
+
+    def predict(self, X):
+        return self._backend(X).predict(X)
@@ -0,0 +1,64 @@
+import cv2
+import numpy as np
+
+from models.metrics import stage
+
+
+def decode_image(source):
+    """
+    Decode an image once into a BGR array.
+    Accepts raw upload bytes, a file path, or an already decoded array.
+    """
+    if isinstance(source, np.ndarray):
+        return source
+
+    with stage('decode'):
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            buffer = np.frombuffer(source, dtype=np.uint8)
+            image = cv2.imdecode(buffer, cv2.IMREAD_COLOR) if buffer.size else None
+        else:
+            image = cv2.imread(source)
+
+    if image is None:
+        raise Exception("Failed to load image")
+    return image
+
+
+def prepare_cnn_input(image, size=(224, 224)):
+    """
+    Resize a decoded BGR image to the CNN input (RGB, float32, MobileNetV2 scaling).
+    Mirrors keras load_img (nearest resize) + img_to_array + preprocess_input
+    without re-reading the file.
+    """
+    # INTER_NEAREST_EXACT samples the same pixels as PIL's nearest (INTER_NEAREST is offset by half a pixel)
+    resized = cv2.resize(image, size, interpolation=cv2.INTER_NEAREST_EXACT)
+    rgb = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB).astype(np.float32)
+    return rgb / 127.5 - 1.0
+
+
+def resize_for_analysis(image, max_side):
+    """
+    Downsample so the longest side is at most max_side (INTER_AREA).
+    Returns (image, area_ratio) where area_ratio scales pixel-area thresholds.
+    """
+    height, width = image.shape[:2]
+    if not max_side or max(height, width) <= max_side:
+        return image, 1.0
+
+    scale = max_side / max(height, width)
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    with stage('resize'):
+        resized = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+    return resized, (size[0] * size[1]) / (width * height)
+
+
+def iter_strips(height, strip_rows, halo=0):
+    """
+    Split image rows into horizontal strips.
+    Yields (start, stop, pad_start, pad_stop): the strip's own rows plus up to
+    `halo` context rows on each side so neighbourhood filters stay exact.
+    """
+    strip_rows = max(1, int(strip_rows))
+    for start in range(0, height, strip_rows):
+        stop = min(start + strip_rows, height)
+        yield start, stop, max(0, start - halo), min(height, stop + halo)
@@ -0,0 +1,166 @@
+import io
+import json
+import math
+import os
+import warnings
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from models.dataset_store import TAIL_BYTES, generated_dataset, load_dataset, source_state, tail_hash
+from models.model_store import artifact_paths, fit_parallel
+
+
+def checkpoint_path(base_path):
+    return f'{base_path}_checkpoint.json'
+
+
+def load_checkpoint(base_path):
+    try:
+        with open(checkpoint_path(base_path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_checkpoint(base_path, checkpoint):
+    path = checkpoint_path(base_path)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def saved_forest_params(base_path, defaults):
+    """Hyperparameters of the last full training (kept in the checkpoint), over the class defaults"""
+    checkpoint = load_checkpoint(base_path) or {}
+    return {**defaults, **checkpoint.get('forestParams', {})}
+
+
+def read_dataset(dataset_path, target, fmt=None):
+    """
+    Read every complete row of a CSV (a half-appended last line is left for next time),
+    through its columnar copy when available (see models/dataset_store.py).
+    Returns (DataFrame, checkpoint) where the checkpoint marks the byte offset read up to.
+    """
+    frame, state = load_dataset(dataset_path, target, fmt)
+    return frame, dict(state, rows=len(frame))
+
+
+def read_new_rows(dataset_path, checkpoint):
+    """
+    Rows appended since the checkpoint, as (DataFrame, advanced checkpoint).
+    Returns (None, None) if the file was rewritten rather than appended to.
+    """
+    if 'offset' not in checkpoint:
+        return read_added_csv(dataset_path, checkpoint)
+
+    with open(dataset_path, 'rb') as f:
+        header = f.readline()
+        f.seek(max(0, checkpoint['offset'] - TAIL_BYTES))
+        tail = f.read(checkpoint['offset'] - f.tell())
+        new_data = f.read()
+
+    if header.decode('utf-8').strip() != checkpoint['header']:
+        return None, None
+    if len(tail) != min(checkpoint['offset'], TAIL_BYTES) or tail_hash(tail) != checkpoint['tailHash']:
+        return None, None
+
+    new_data = new_data[:new_data.rfind(b'\n') + 1]
+    if not new_data:
+        return pd.DataFrame(), dict(checkpoint)
+    frame = pd.read_csv(io.BytesIO(header + new_data))
+    advanced = dict(checkpoint, offset=checkpoint['offset'] + len(new_data), rows=checkpoint['rows'] + len(frame),
+                    tailHash=tail_hash(tail + new_data))
+    return frame, advanced
+
+
+def read_added_csv(dataset_path, checkpoint):
+    """
+    read_new_rows for a model trained on a generated dataset alone: every complete
+    row of a CSV added next to it since is new, as load_dataset appends it to the base.
+    """
+    base = {key: value for key, value in checkpoint.items() if key != 'rows'}
+    state = source_state(dataset_path)
+    if generated_dataset(dataset_path)[1] != base or state['header'] != base['header']:
+        return None, None
+    with open(dataset_path, 'rb') as f:
+        data = f.read(state['offset'])
+    frame = pd.read_csv(io.BytesIO(data)) if data.count(b'\n') > 1 else pd.DataFrame()
+    return frame, dict(state, base=base, rows=checkpoint['rows'] + len(frame))
+
+
+def grow_forest(model, X, y, n_new_estimators, n_jobs=None):
+    """
+    Add n_new_estimators trees fitted on (X, y) to a copy of a fitted forest (warm_start).
+    Classifiers must see every known class, so classes missing from y get a
+    zero-weight anchor row; returns None if y contains a class the forest never saw.
+    """
+    y = pd.Series(y).reset_index(drop=True)
+    X = pd.DataFrame(X).reset_index(drop=True)
+    sample_weight = np.ones(len(y))
+
+    if hasattr(model, 'classes_'):
+        known = set(model.classes_.tolist())
+        if not set(y) <= known:
+            return None
+        missing = sorted(known - set(y))
+        if missing:
+            # Copies of a real row: no split can separate them, and their weight is zero
+            X = pd.concat([X, X.iloc[[0] * len(missing)]], ignore_index=True)
+            y = pd.concat([y, pd.Series(missing)], ignore_index=True)
+            sample_weight = np.concatenate([sample_weight, np.zeros(len(missing))])
+
+    model.set_params(warm_start=True, n_estimators=model.n_estimators + n_new_estimators)
+    with warnings.catch_warnings():
+        # Small increments covering many classes trip sklearn's "looks like regression" check
+        warnings.filterwarnings('ignore', message='The number of unique classes')
+        fit_parallel(model, X, y, n_jobs, sample_weight=sample_weight)
+    model.set_params(warm_start=False)
+    return model
+
+
+def incremental_update(base_path, dataset_path, target, min_rows=10, max_growth=3.0):
+    """
+    Grow the saved forest with the rows appended to dataset_path since its checkpoint.
+    New trees are proportional to the new rows (same trees-per-row ratio as the last
+    full training). Returns a dict with 'status':
+      'updated'   -> 'model' holds the grown forest (a copy; the saved one is untouched)
+      'unchanged' -> fewer than min_rows new rows; the checkpoint is not advanced
+      'retrain'   -> a full retrain is needed ('reason' says why)
+    """
+    checkpoint = load_checkpoint(base_path)
+    model_file = artifact_paths(base_path)['joblib']
+    if checkpoint is None or not os.path.exists(model_file):
+        return {'status': 'retrain', 'reason': 'no checkpoint'}
+    if not os.path.exists(dataset_path):
+        # A generated columnar dataset has no CSV to append to: current while it is unchanged
+        _, state = generated_dataset(dataset_path)
+        if state and all(checkpoint.get(key) == value for key, value in state.items()):
+            return {'status': 'unchanged', 'newRows': 0, 'rows': checkpoint['rows']}
+        return {'status': 'retrain', 'reason': 'dataset missing'}
+
+    new_rows, advanced = read_new_rows(dataset_path, checkpoint)
+    if new_rows is None:
+        return {'status': 'retrain', 'reason': 'dataset was rewritten'}
+    if len(new_rows) < min_rows:
+        return {'status': 'unchanged', 'newRows': len(new_rows), 'rows': checkpoint['rows']}
+
+    # A private, writable copy: requests keep using the current model meanwhile
+    model = joblib.load(model_file)
+    if model.n_estimators != checkpoint['nEstimators']:
+        return {'status': 'retrain', 'reason': 'model and checkpoint out of sync'}
+    n_new = max(1, math.ceil(checkpoint['baseEstimators'] * len(new_rows) / checkpoint['baseRows']))
+    if model.n_estimators + n_new > checkpoint['baseEstimators'] * max_growth:
+        return {'status': 'retrain', 'reason': 'forest grew past max_growth; rebuilding compactly'}
+
+    grown = grow_forest(model, new_rows.drop(target, axis=1), new_rows[target], n_new)
+    if grown is None:
+        return {'status': 'retrain', 'reason': 'new rows contain unseen labels'}
+
+    advanced['nEstimators'] = grown.n_estimators
+    advanced['updatedAt'] = datetime.now().isoformat()
+    return {'status': 'updated', 'model': grown, 'checkpoint': advanced,
+            'newRows': len(new_rows), 'addedEstimators': n_new, 'rows': advanced['rows']}
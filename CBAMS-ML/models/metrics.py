@@ -0,0 +1,183 @@
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Per-stage latency instrumentation. Code wraps its stages in `with stage('decode'):`;
+# each timing goes into a histogram labelled with the route being served (rendered
+# in Prometheus text format by /metrics) and into the current request's timing
+# breakdown (returned on request in the X-Timing header).
+ENABLED = os.environ.get('ML_METRICS', 'true').lower() in ('1', 'true', 'yes')
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Route label for work done outside a request (CLI jobs, warm-up, background threads)
+OFFLINE_ROUTE = 'offline'
+
+_route = contextvars.ContextVar('metrics_route', default=OFFLINE_ROUTE)
+_timings = contextvars.ContextVar('metrics_timings', default=None)  # stage -> seconds, per request
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram (thread-safe)"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot: above the largest bound (+Inf)
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.total += seconds
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.total, self.count
+
+
+class MetricsRegistry:
+    """Latency histograms keyed by (route, stage), plus request counts by status"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.stages = {}
+        self.requests = {}
+        self.statuses = {}
+        self._lock = threading.Lock()
+
+    def _histogram(self, table, key):
+        histogram = table.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = table.setdefault(key, Histogram(self.buckets))
+        return histogram
+
+    def observe_stage(self, route, stage_name, seconds):
+        self._histogram(self.stages, (route, stage_name)).observe(seconds)
+
+    def observe_request(self, route, status, seconds):
+        self._histogram(self.requests, route).observe(seconds)
+        with self._lock:
+            self.statuses[(route, status)] = self.statuses.get((route, status), 0) + 1
+
+    def render(self):
+        """Prometheus text exposition format"""
+        lines = [
+            '# HELP cbams_ml_stage_seconds Time spent in each pipeline stage, by route.',
+            '# TYPE cbams_ml_stage_seconds histogram'
+        ]
+        for (route, stage_name), histogram in sorted(self.stages.items()):
+            lines += self._render_histogram('cbams_ml_stage_seconds', {'route': route, 'stage': stage_name}, histogram)
+        lines += [
+            '# HELP cbams_ml_request_seconds Total request latency, by route.',
+            '# TYPE cbams_ml_request_seconds histogram'
+        ]
+        for route, histogram in sorted(self.requests.items()):
+            lines += self._render_histogram('cbams_ml_request_seconds', {'route': route}, histogram)
+        lines += [
+            '# HELP cbams_ml_requests_total Requests served, by route and status code.',
+            '# TYPE cbams_ml_requests_total counter'
+        ]
+        with self._lock:
+            statuses = sorted(self.statuses.items())
+        for (route, status), count in statuses:
+            lines.append(f'cbams_ml_requests_total{format_labels({"route": route, "status": status})} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def _render_histogram(self, name, labels, histogram):
+        counts, total, count = histogram.snapshot()
+        lines, cumulative = [], 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            le = '+Inf' if bound == float('inf') else f'{bound:g}'
+            lines.append(f'{name}_bucket{format_labels({**labels, "le": le})} {cumulative}')
+        lines.append(f'{name}_sum{format_labels(labels)} {total:.6f}')
+        lines.append(f'{name}_count{format_labels(labels)} {count}')
+        return lines
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    return '{' + ','.join(f'{key}="{escape_label(value)}"' for key, value in labels.items()) + '}'
+
+
+registry = MetricsRegistry()
+
+
+def record(stage_name, seconds):
+    """Add a stage timing to the histograms and to the current request's breakdown"""
+    if not ENABLED:
+        return
+    route = _route.get()
+    if route is not None:  # None while collecting for replay (see collect)
+        registry.observe_stage(route, stage_name, seconds)
+    timings = _timings.get()
+    if timings is not None:
+        timings[stage_name] = timings.get(stage_name, 0.0) + seconds
+
+
+@contextmanager
+def stage(stage_name):
+    """Time the enclosed block as `stage_name` (repeated stages within a request add up)"""
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage_name, time.perf_counter() - start)
+
+
+def begin_request(route):
+    """Start collecting stage timings for a request; returns a token for finish_request"""
+    return _route.set(route), _timings.set({}), time.perf_counter()
+
+
+def finish_request(token, status):
+    """
+    Record the request's total latency and status.
+    Returns (stage breakdown, total), both in seconds.
+    """
+    route_token, timings_token, start = token
+    total = time.perf_counter() - start
+    timings = _timings.get() or {}
+    if ENABLED:
+        registry.observe_request(_route.get(), status, total)
+    _route.reset(route_token)
+    _timings.reset(timings_token)
+    return timings, total
+
+
+@contextmanager
+def collect():
+    """
+    Capture stage timings of the enclosed block into a dict, without touching the
+    histograms. Used in worker processes, whose timings are replayed in the serving
+    process with record().
+    """
+    timings = {}
+    token = _timings.set(timings)
+    route_token = _route.set(None)
+    try:
+        yield timings
+    finally:
+        _route.reset(route_token)
+        _timings.reset(token)
+
+
+def format_timings(timings, total=None):
+    """X-Timing header value: 'decode=1.23, color=4.56, total=7.89' (milliseconds)"""
+    items = list(timings.items()) + ([('total', total)] if total is not None else [])
+    return ', '.join(f'{name}={seconds * 1000:.2f}' for name, seconds in items)
@@ -0,0 +1,248 @@
+import hashlib
+import os
+import threading
+import time
+
+
+class LazyModel:
+    """
+    Thread-safe lazy holder for an ML model.
+    The model is built on first use (get) or in a background warm-up thread,
+    whichever comes first. Concurrent callers share a single load.
+
+    It also acts as a small registry: when watch_paths are given, a new
+    instance can be built from changed artifacts and swapped in atomically.
+    The previous instance is kept for rollback. Callers that took a snapshot
+    keep the instance they started with. An instance pushed out of the
+    rollback slot is closed (if it has close()) to release its threads.
+    """
+
+    def __init__(self, name, factory, watch_paths=()):
+        self.name = name
+        self.factory = factory
+        self.watch_paths = list(watch_paths)
+        self.instance = None
+        self.state = 'pending'  # pending -> loading -> ready | failed
+        self.error = None
+        self.load_time = None
+        self.loaded_at = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+        # Versioning: (instance, version) is replaced as one tuple
+        self.generation = 0
+        self.version = None
+        self.fingerprint = None
+        self._current = (None, None)
+        self.previous = None  # (instance, version, fingerprint) for rollback
+        self.pinned_fingerprint = None  # artifacts rolled back from; not auto-reloaded
+        self.reload_error = None
+        self._reload_lock = threading.Lock()
+
+    def get(self, timeout=None):
+        """Return the model instance, loading it if needed"""
+        if self.state == 'ready':
+            return self.instance
+
+        if self._claim_load():
+            self._load()
+        elif not self._ready.wait(timeout):
+            raise Exception(f"Model '{self.name}' is still loading")
+
+        if self.state == 'failed':
+            raise Exception(f"Model '{self.name}' failed to load: {self.error}")
+        return self.instance
+
+    def warm_up(self):
+        """Start loading in a background thread (no-op if already started)"""
+        if not self._claim_load():
+            return None
+        thread = threading.Thread(target=self._load, name=f'warmup-{self.name}', daemon=True)
+        thread.start()
+        return thread
+
+    def _claim_load(self):
+        with self._lock:
+            if self.state != 'pending':
+                return False
+            self.state = 'loading'
+            return True
+
+    def _load(self):
+        start = time.perf_counter()
+        try:
+            # Fingerprint first: artifacts replaced during the load trigger a reload later
+            fingerprint = self.artifact_fingerprint()
+            self._swap(self.factory(), fingerprint, keep_previous=False)
+            self.state = 'ready'
+            print(f"✅ {self.name} ready in {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            self.error = str(e)
+            self.state = 'failed'
+            print(f"❌ {self.name} failed to load: {e}")
+        finally:
+            self.load_time = round(time.perf_counter() - start, 3)
+            self.loaded_at = time.time()
+            self._ready.set()
+
+    def snapshot(self):
+        """(instance, version) of the active model, read together"""
+        self.get()
+        return self._current
+
+    def artifact_fingerprint(self):
+        """Short hash of the watched files' sizes and mtimes (None if nothing is watched)"""
+        if not self.watch_paths:
+            return None
+        parts = []
+        for path in self.watch_paths:
+            try:
+                stat = os.stat(path)
+                parts.append(f'{path}:{stat.st_size}:{stat.st_mtime_ns}')
+            except OSError:
+                parts.append(f'{path}:missing')
+        return hashlib.blake2b('|'.join(parts).encode(), digest_size=4).hexdigest()
+
+    def _swap(self, instance, fingerprint, keep_previous=True):
+        retired = None
+        with self._lock:
+            if keep_previous and self.instance is not None:
+                retired = self.previous
+                self.previous = (self.instance, self.version, self.fingerprint)
+            self.generation += 1
+            self.version = f'v{self.generation}' + (f':{fingerprint}' if fingerprint else '')
+            self.instance, self.fingerprint = instance, fingerprint
+            self._current = (instance, self.version)
+            self.pinned_fingerprint = None
+            self.loaded_at = time.time()
+        if retired is not None:
+            self._close(*retired[:2])
+
+    def _close(self, instance, version):
+        """Release an instance that can no longer be rolled back to"""
+        close = getattr(instance, 'close', None)
+        if not callable(close):
+            return
+        try:
+            close()
+        except Exception as e:
+            print(f"⚠️ {self.name} {version} did not close cleanly: {e}")
+
+    def reload(self):
+        """Build a fresh instance from the current artifacts and swap it in"""
+        with self._reload_lock:
+            fingerprint = self.artifact_fingerprint()
+            start = time.perf_counter()
+            try:
+                instance = self.factory()
+            except Exception as e:
+                self.reload_error = str(e)
+                print(f"❌ {self.name} reload failed, keeping {self.version}: {e}")
+                return False
+            self._swap(instance, fingerprint)
+            self.reload_error = None
+            self.state = 'ready'
+            self._ready.set()
+            print(f"🔄 {self.name} reloaded as {self.version} in {time.perf_counter() - start:.2f}s")
+            return True
+
+    def rebuild(self, build):
+        """
+        Swap in an instance made by build(factory) -> (instance or None, result),
+        e.g. a freshly trained model. The watcher does not reload meanwhile.
+        """
+        with self._reload_lock:
+            instance, result = build(self.factory)
+            if instance is not None:
+                # Taken after the build, so artifacts it wrote are not reloaded again
+                self._swap(instance, self.artifact_fingerprint())
+                self.state = 'ready'
+                self._ready.set()
+            return result
+
+    def rollback(self):
+        """Reactivate the previous version; its newer artifacts are not auto-reloaded again"""
+        with self._reload_lock, self._lock:
+            if self.previous is None:
+                raise Exception(f"No previous version of '{self.name}' to roll back to")
+            rolled_back_from = self.fingerprint
+            instance, version, fingerprint = self.previous
+            self.previous = (self.instance, self.version, self.fingerprint)
+            self.instance, self.version, self.fingerprint = instance, version, fingerprint
+            self._current = (instance, version)
+            self.pinned_fingerprint = rolled_back_from
+        print(f"⏪ {self.name} rolled back to {self.version}")
+        return self.version
+
+    def needs_reload(self):
+        """Fingerprint of changed artifacts, or None if the active model is current"""
+        if self.state != 'ready' or not self.watch_paths or self._reload_lock.locked():
+            return None
+        fingerprint = self.artifact_fingerprint()
+        if fingerprint in (self.fingerprint, self.pinned_fingerprint):
+            return None
+        return fingerprint
+
+    def status(self):
+        """Load state summary for health reporting"""
+        return {
+            'state': self.state,
+            'version': self.version,
+            'previousVersion': self.previous[1] if self.previous else None,
+            'loadTimeSeconds': self.load_time,
+            'loadedAt': self.loaded_at,
+            'error': self.error,
+            'reloadError': self.reload_error
+        }
+
+    def __getattr__(self, attr):
+        # Delegate model methods (predict, detect, ...) to the loaded instance
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        return getattr(self.get(), attr)
+
+
+class ModelWatcher:
+    """
+    Polls the watched artifacts of LazyModels and hot-reloads a model once its
+    files have changed and then stayed unchanged for one poll interval (so a
+    half-written export is never loaded).
+    """
+
+    def __init__(self, models, interval=5.0):
+        self.models = [model for model in models if model.watch_paths]
+        self.interval = interval
+        self.pending = {}  # model name -> fingerprint seen on the previous poll
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='model-watcher', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def check(self):
+        for model in self.models:
+            fingerprint = model.needs_reload()
+            if fingerprint is None:
+                self.pending.pop(model.name, None)
+            elif self.pending.get(model.name) == fingerprint:
+                self.pending.pop(model.name)
+                model.reload()
+            else:
+                self.pending[model.name] = fingerprint
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"⚠️ Model watcher error: {e}")
+
+
+def warm_up_all(models):
+    """Load every model in parallel background threads"""
+    return [t for t in (model.warm_up() for model in models) if t is not None]
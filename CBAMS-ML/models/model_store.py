@@ -0,0 +1,91 @@
+import os
+import pickle
+
+import joblib
+
+from models.flat_forest import FlatForest, HybridForest
+
+# Forest inference backend: 'sklearn' (joblib artifact, one private copy per process),
+# 'flat' (mmap'd node arrays, shared between worker processes)
+# or 'hybrid' (flat for small batches, sklearn for large ones)
+DEFAULT_BACKEND = os.environ.get('ML_FOREST_BACKEND', 'sklearn')
+# Cores used to fit trees (-1 = all cores)
+DEFAULT_TRAIN_JOBS = int(os.environ.get('ML_TRAIN_JOBS', -1))
+
+
+def artifact_paths(base_path):
+    """Artifact locations for a model stored under e.g. trained_models/crop_model"""
+    return {
+        'joblib': f'{base_path}.joblib',
+        'flat': f'{base_path}_forest',
+        'pickle': f'{base_path}.pkl'  # legacy format
+    }
+
+
+def save_model(model, base_path):
+    """
+    Save a fitted forest as a joblib file and as a flat node-array export.
+    Only the flat export can be shared between workers: sklearn copies tree
+    nodes into its own buffers when it unpickles, even from a memory map.
+    """
+    paths = artifact_paths(base_path)
+    os.makedirs(os.path.dirname(base_path) or '.', exist_ok=True)
+
+    # Per-process temp name: workers starting together may train and save at once
+    tmp_path = f"{paths['joblib']}.{os.getpid()}.tmp"
+    joblib.dump(model, tmp_path)
+    os.replace(tmp_path, paths['joblib'])
+
+    FlatForest.from_sklearn(model).save(paths['flat'])
+
+
+def fit_parallel(model, X, y, n_jobs=None, **fit_params):
+    """
+    Fit a forest with its trees built on n_jobs cores, then reset n_jobs so the
+    saved model predicts in the calling thread (per-request joblib dispatch costs
+    more than it saves on small batches).
+    """
+    model.set_params(n_jobs=DEFAULT_TRAIN_JOBS if n_jobs is None else n_jobs)
+    try:
+        model.fit(X, y, **fit_params)
+    finally:
+        model.set_params(n_jobs=None)
+    return model
+
+
+def load_model(base_path, backend=None):
+    """
+    Load a saved forest for the requested backend.
+    Returns None when nothing is saved yet. Legacy .pkl files are migrated.
+    """
+    backend = backend or DEFAULT_BACKEND
+    paths = artifact_paths(base_path)
+
+    if not os.path.exists(paths['joblib']) and os.path.exists(paths['pickle']):
+        print(f"📦 Migrating {paths['pickle']} to joblib/flat artifacts...")
+        with open(paths['pickle'], 'rb') as f:
+            save_model(pickle.load(f), base_path)
+
+    if backend == 'flat':
+        if not FlatForest.exists(paths['flat']) and os.path.exists(paths['joblib']):
+            FlatForest.from_sklearn(joblib.load(paths['joblib'])).save(paths['flat'])
+        if FlatForest.exists(paths['flat']):
+            return FlatForest.load(paths['flat'], mmap=True)
+        return None
+
+    if not os.path.exists(paths['joblib']):
+        return None
+    model = joblib.load(paths['joblib'])
+    return as_backend(model, base_path, backend)
+
+
+def as_backend(model, base_path, backend=None):
+    """Wrap a fitted forest for the requested backend"""
+    backend = backend or DEFAULT_BACKEND
+    if backend == 'flat':
+        return FlatForest.load(artifact_paths(base_path)['flat'], mmap=True)
+    if backend == 'hybrid':
+        flat_path = artifact_paths(base_path)['flat']
+        flat = FlatForest.load(flat_path, mmap=True) if FlatForest.exists(flat_path) else FlatForest.from_sklearn(model)
+        return HybridForest(model, flat)
+    return model
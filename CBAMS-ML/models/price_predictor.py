@@ -1,65 +1,192 @@
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
+import itertools
+import math
 import os
+import threading
+import time
+import zlib
 
 class PricePredictor:
-    def __init__(self):
+    # Longest forecast horizon accepted from requests
+    MAX_WEEKS = 52
+    MAX_MONTHS = 12
+    # Bulk requests may name each known crop a few times over (aliases, unknown crops)
+    MAX_BULK_FACTOR = 4
+
+    def __init__(self, seed=42, cache_ttl=900, horizon_weeks=8, cache_entries=4096):
         # Simulated base prices for different crops (per Quintal/100kg)
         self.base_prices = {
             'Rice': 2200, 'Maize': 1900, 'Cotton': 6500,
             'Wheat': 2100, 'Soya': 4500, 'Tomato': 3000,
             'Potato': 1500, 'Onion': 2500, 'Sugarcane': 350
         }
-        
-    def predict_forecast(self, crop, current_date=None):
-        """Predict price for the next 8 weeks for a given crop"""
-        if current_date is None:
-            current_date = datetime.now()
-            
-        base = self.base_prices.get(crop.title(), 2000)
-        
+        self.seed = seed
+        self.horizon_weeks = horizon_weeks
+        self.model_version = f"seasonal/seed:{seed}"
+
+        # Forecast cache: (crop, date, weeks) -> (expires_at, forecast)
+        self.cache_ttl = cache_ttl
+        self.cache_entries = cache_entries
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def resolve_horizon(self, weeks=None, months=None):
+        """
+        Forecast horizon in weeks (months are converted, e.g. 3 months -> 13 weeks).
+        Raises ValueError for non-numeric or out of range values.
+        """
+        if weeks:
+            return int(self.parse_horizon(weeks, 'weeks', self.MAX_WEEKS))
+        if months:
+            return math.ceil(self.parse_horizon(months, 'months', self.MAX_MONTHS) * 52 / 12)
+        return self.horizon_weeks
+
+    def parse_horizon(self, value, name, maximum):
+        error = ValueError(f"'{name}' must be a number between 1 and {maximum}")
+        if isinstance(value, bool):
+            raise error
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            raise error from None
+        if not math.isfinite(number) or not 1 <= number <= maximum:
+            raise error
+        return number
+
+    @property
+    def max_bulk_crops(self):
+        return len(self.base_prices) * self.MAX_BULK_FACTOR
+
+    def market_volatility(self, crops, start_date, weeks):
+        """
+        Random market volatility (-2%..+5%) for every crop and week in one array op.
+        Counter-based RNG: each value is a hash of (seed, crop, start date, week), so
+        a cached forecast and a fresh one for the same day are identical.
+        """
+        day_key = (self.seed * 0x9E3779B97F4A7C15 + start_date.toordinal() * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+        crop_keys = np.array([zlib.crc32(crop.encode()) for crop in crops], dtype=np.uint64)
+        week_keys = np.arange(1, weeks + 1, dtype=np.uint64)
+        # uint64 array arithmetic wraps around, as the hash expects
+        x = np.uint64(day_key) + crop_keys[:, None] * np.uint64(0x94D049BB133111EB) + week_keys[None, :]
+        # splitmix64 finalizer
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        x = x ^ (x >> np.uint64(31))
+        uniform = (x >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+        return 1.0 + (-0.02 + uniform * 0.07)
+
+    def forecast_matrix(self, crops, current_date, weeks):
+        """Prices for every crop (rows) and week (columns), computed as array ops"""
+        start = np.datetime64(current_date.date(), 'D')
+        future_dates = start + np.arange(1, weeks + 1) * 7
+
         # Seasonality factor (sine wave)
         # Assuming peak prices every 12 months
-        day_of_year = current_date.timetuple().tm_yday
         seasonal_peak = 180 # July peak (hypothetical)
-        
-        forecast = []
-        for week in range(1, 9):
-            future_date = current_date + timedelta(weeks=week)
-            future_day = future_date.timetuple().tm_yday
-            
-            # Sine wave for seasonality
-            seasonality = 1.0 + 0.15 * np.sin(2 * np.pi * (future_day - seasonal_peak) / 365)
-            
-            # Add some random market volatility (trend)
-            volatility = 1.0 + np.random.uniform(-0.02, 0.05)
-            
-            price = round(base * seasonality * volatility, 2)
-            
-            forecast.append({
+        future_days = (future_dates - future_dates.astype('datetime64[Y]')).astype(int) + 1
+        seasonality = 1.0 + 0.15 * np.sin(2 * np.pi * (future_days - seasonal_peak) / 365)
+
+        base = np.array([self.base_prices.get(crop, 2000) for crop in crops], dtype=np.float64)
+        prices = np.round(base[:, None] * seasonality[None, :] * self.market_volatility(crops, current_date.date(), weeks), 2)
+        return future_dates.astype(str).tolist(), base, prices
+
+    def build_forecasts(self, crops, current_date, weeks):
+        """Forecast dicts for a list of (title-cased) crops from one vectorized pass"""
+        dates, _, prices = self.forecast_matrix(crops, current_date, weeks)
+        results = {}
+        for crop, row in zip(crops, prices.tolist()):
+            base = self.base_prices.get(crop, 2000)
+            forecast = [{
                 'week': week,
-                'date': future_date.strftime('%Y-%m-%d'),
+                'date': date,
                 'price': price,
                 'unit': 'INR/Quintal',
                 'trend': 'Up' if price > base else 'Down'
-            })
-            
-        return {
-            'crop': crop.title(),
-            'currentPrice': base,
-            'forecast': forecast,
-            'marketRecommendation': 'Sell' if forecast[-1]['price'] < base else 'Hold'
-        }
-        
-    def predict_best_time_to_sell(self, crop):
-        """Predict best time to sell in the next 3 months"""
-        forecast = self.predict_forecast(crop)['forecast']
+            } for week, (date, price) in enumerate(zip(dates, row), start=1)]
+
+            results[crop] = {
+                'crop': crop,
+                'currentPrice': base,
+                'forecast': forecast,
+                'marketRecommendation': 'Sell' if forecast[-1]['price'] < base else 'Hold'
+            }
+        return results
+
+    def get_forecasts(self, crops, current_date=None, weeks=None):
+        """Cached forecasts for many crops; misses are filled for all crops at once"""
+        if current_date is None:
+            current_date = datetime.now()
+        weeks = self.resolve_horizon(weeks)
+        crops = [crop.title() for crop in crops]
+        day = current_date.date()
+        now = time.monotonic()
+
+        with self._cache_lock:
+            results, missing = {}, []
+            for crop in crops:
+                entry = self._cache.get((crop, day, weeks))
+                if entry and entry[0] > now:
+                    results[crop] = entry[1]
+                elif crop not in missing:
+                    missing.append(crop)
+            self.cache_hits += len(crops) - len(missing)
+            self.cache_misses += len(missing)
+
+        if missing:
+            # One pass covers the requested crops plus every known crop for this day
+            to_compute = list(dict.fromkeys(missing + list(self.base_prices)))
+            computed = self.build_forecasts(to_compute, current_date, weeks)
+            expires_at = now + self.cache_ttl
+            with self._cache_lock:
+                self._cache = {key: entry for key, entry in self._cache.items() if entry[0] > now}
+                for crop, forecast in computed.items():
+                    self._cache[(crop, day, weeks)] = (expires_at, forecast)
+                # Unknown crop names are cached too: drop the oldest entries beyond the limit
+                excess = len(self._cache) - self.cache_entries
+                for key in list(itertools.islice(self._cache, max(0, excess))):
+                    del self._cache[key]
+            results.update({crop: computed[crop] for crop in missing})
+
+        return [results[crop] for crop in crops]
+
+    def predict_forecast(self, crop, current_date=None, weeks=None):
+        """Predict price for the next 8 weeks (or a custom horizon) for a given crop"""
+        return self.get_forecasts([crop], current_date, weeks)[0]
+
+    def predict_forecast_bulk(self, crops=None, current_date=None, weeks=None, include_best_time=False):
+        """Forecasts (and optionally best selling times) for a list of crops, or every known crop"""
+        crops = list(crops) if crops else list(self.base_prices)
+        forecasts = self.get_forecasts(crops, current_date, weeks)
+        result = {'forecasts': forecasts}
+        if include_best_time:
+            result['bestTimeToSell'] = [self.best_time_from_forecast(f['crop'], f['forecast']) for f in forecasts]
+        return result
+
+    def predict_best_time_to_sell(self, crop, current_date=None, weeks=None):
+        """Predict best time to sell within the forecast horizon"""
+        forecast = self.predict_forecast(crop, current_date, weeks)['forecast']
+        return self.best_time_from_forecast(crop, forecast)
+
+    def best_time_from_forecast(self, crop, forecast):
         best_week = max(forecast, key=lambda x: x['price'])
-        
+
         return {
             'crop': crop.title(),
             'optimalSellDate': best_week['date'],
             'estimatedMaxPrice': best_week['price'],
             'profitMargin': round((best_week['price'] - self.base_prices.get(crop.title(), 2000)) / 100, 2)
         }
+
+    def cache_stats(self):
+        with self._cache_lock:
+            return {
+                'entries': len(self._cache),
+                'maxEntries': self.cache_entries,
+                'hits': self.cache_hits,
+                'misses': self.cache_misses,
+                'ttlSeconds': self.cache_ttl
+            }
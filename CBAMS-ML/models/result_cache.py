@@ -0,0 +1,126 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def content_hash(data):
+    """Fast digest of raw upload bytes"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe LRU cache bounded by entry count and approximate memory"""
+
+    def __init__(self, max_entries=10000, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        # Bumped by invalidate(): values computed before it are not stored (see put)
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size=None, generation=None):
+        """
+        Store a value. With generation (read before computing the value), the put is
+        dropped if the cache was invalidated since, e.g. by a model swap mid-request.
+        """
+        if size is None:
+            size = len(json.dumps(value, default=str))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self, predicate=None):
+        """Drop every entry (or those whose key matches predicate)"""
+        with self._lock:
+            self.generation += 1
+            if predicate is None:
+                self._entries.clear()
+                self.current_bytes = 0
+                return
+            for key in [key for key in self._entries if predicate(key)]:
+                self.current_bytes -= self._entries.pop(key)[1]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'maxBytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': round(self.hits / lookups, 4) if lookups else 0,
+                'evictions': self.evictions
+            }
+
+
+class ResultCache(LRUCache):
+    """
+    Analysis results keyed by (namespace, content hash, extra params, model version).
+    When a namespace reports a new model version its old entries are purged.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.versions = {}
+
+    def _check_version(self, namespace, version):
+        if self.versions.get(namespace, version) != version:
+            self.invalidate(lambda key: key[0] == namespace)
+        self.versions[namespace] = version
+
+    def lookup(self, namespace, version, digest, *params):
+        self._check_version(namespace, version)
+        return self.get((namespace, digest, params, version))
+
+    def store(self, namespace, version, digest, *params, result):
+        self.put((namespace, digest, params, version), result)
+
+
+class QuantizedPredictionCache(LRUCache):
+    """
+    Tabular prediction cache keyed on a quantized feature vector.
+    resolutions gives the rounding step per feature (e.g. 1 for N/P/K, 0.1 for pH),
+    so near-identical sensor readings share one entry.
+    """
+
+    def __init__(self, resolutions, max_entries=4096, max_bytes=16 * 1024 * 1024):
+        super().__init__(max_entries=max_entries, max_bytes=max_bytes)
+        self.resolutions = np.asarray(resolutions, dtype=np.float64)
+
+    def cacheable(self, features):
+        """NaN/inf cannot be quantized into a key (casting them to int64 is undefined)"""
+        return bool(np.isfinite(features).all())
+
+    def quantize(self, features):
+        """Return (cache keys, snapped features) for an N x F matrix of finite features"""
+        steps = np.round(features / self.resolutions).astype(np.int64)
+        return [tuple(row) for row in steps.tolist()], steps * self.resolutions
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+
+# Synthetic training data for the tabular models, generated as array operations
+# on a seeded np.random.Generator. Rows are produced in chunks, so datasets of
+# tens of millions of rows can be streamed to disk (see generate_data.py) with
+# memory bounded by the chunk size. The same seed and chunk size give the same data.
+
+CHUNK_ROWS = 500_000
+
+CROPS = [
+    'rice', 'maize', 'chickpea', 'kidneybeans', 'pigeonpeas',
+    'mothbeans', 'mungbean', 'blackgram', 'lentil', 'pomegranate',
+    'banana', 'mango', 'grapes', 'watermelon', 'muskmelon', 'apple',
+    'orange', 'papaya', 'coconut', 'cotton', 'jute', 'coffee'
+]
+CROP_FEATURES = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+
+# Real-world approximate ranges for these crops
+# N, P, K, temp, hum, ph, rain
+CROP_PARAMS = {
+    'rice': [(60, 100), (35, 60), (35, 45), (20, 27), (80, 85), (6.0, 7.0), (200, 300)],
+    'maize': [(60, 100), (35, 60), (15, 25), (18, 27), (55, 75), (5.5, 7.0), (60, 110)],
+    'cotton': [(100, 140), (40, 60), (15, 25), (22, 28), (75, 85), (7.0, 8.5), (60, 100)],
+    'coffee': [(80, 120), (15, 35), (25, 45), (23, 28), (50, 60), (6.0, 7.5), (140, 200)],
+    'banana': [(80, 120), (70, 95), (45, 55), (25, 30), (75, 85), (5.5, 6.5), (90, 110)],
+    # Simplified defaults for others to save space but maintain variety
+}
+DEFAULT_CROP_PARAMS = [(20, 120), (20, 120), (10, 200), (15, 35), (30, 90), (5.0, 8.5), (40, 250)]
+
+# Yield features: uniform ranges (area in hectares)
+YIELD_RANGES = {
+    'N': (20, 120), 'P': (20, 100), 'K': (10, 200),
+    'temperature': (15, 40), 'rainfall': (50, 250), 'area': (1, 50)
+}
+
+
+def make_rng(seed=42):
+    return np.random.default_rng(seed)
+
+
+def iter_chunk_bounds(n_rows, chunk_rows):
+    for start in range(0, n_rows, chunk_rows):
+        yield start, min(start + chunk_rows, n_rows)
+
+
+def crop_recommendation_chunks(n_rows, rng=None, chunk_rows=CHUNK_ROWS, dtype=np.float32):
+    """
+    Yield DataFrames of crop recommendation rows (N..rainfall, label).
+    Crops are grouped in CROPS order with an equal share of the rows each.
+    """
+    rng = rng if rng is not None else make_rng()
+    ranges = np.array([CROP_PARAMS.get(crop, DEFAULT_CROP_PARAMS) for crop in CROPS], dtype=np.float64)
+    low, span = ranges[:, :, 0], ranges[:, :, 1] - ranges[:, :, 0]  # (crops, features)
+
+    for start, stop in iter_chunk_bounds(n_rows, chunk_rows):
+        crop_index = np.arange(start, stop, dtype=np.int64) * len(CROPS) // n_rows
+        values = low[crop_index] + span[crop_index] * rng.random((stop - start, len(CROP_FEATURES)))
+        chunk = pd.DataFrame(values.astype(dtype, copy=False), columns=CROP_FEATURES)
+        chunk['label'] = pd.Categorical.from_codes(crop_index, CROPS)
+        yield chunk
+
+
+def yield_chunks(n_rows, rng=None, chunk_rows=CHUNK_ROWS, dtype=np.float32):
+    """Yield DataFrames of yield rows (N, P, K, temperature, rainfall, area, yield)"""
+    rng = rng if rng is not None else make_rng()
+    ranges = np.array(list(YIELD_RANGES.values()), dtype=np.float64)
+
+    for start, stop in iter_chunk_bounds(n_rows, chunk_rows):
+        n = stop - start
+        features = ranges[:, 0] + (ranges[:, 1] - ranges[:, 0]) * rng.random((n, len(YIELD_RANGES)))
+        N, P, K, temp, rain, area = features.T
+
+        # Yield formula (simplified logic: Yield = Area * BaseRate * Factors)
+        # Base rate 2-6 tonnes per hectare
+        base_rate = rng.uniform(2, 6, n)
+        # Environmental impact factors (0.8 to 1.2)
+        nutrient_factor = (N / 80 + P / 60 + K / 100) / 3
+        weather_factor = (temp / 25 + rain / 150) / 2
+        yield_tonnes = area * base_rate * (nutrient_factor * 0.4 + weather_factor * 0.6)
+        # Add some noise
+        yield_tonnes += rng.normal(0, yield_tonnes * 0.05)
+
+        chunk = pd.DataFrame(features.astype(dtype, copy=False), columns=list(YIELD_RANGES))
+        chunk['yield'] = yield_tonnes
+        yield chunk
+
+
+GENERATORS = {
+    'crop': (crop_recommendation_chunks, 'label'),
+    'yield': (yield_chunks, 'yield')
+}
+
+
+def generate(dataset, n_rows, seed=42, chunk_rows=CHUNK_ROWS):
+    """A whole synthetic dataset ('crop' or 'yield') in memory"""
+    chunks = GENERATORS[dataset][0](n_rows, make_rng(seed), chunk_rows)
+    return pd.concat(chunks, ignore_index=True)
@@ -0,0 +1,176 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import resource_tracker, shared_memory
+
+import cv2
+import numpy as np
+
+from models import metrics
+
+# Per-process analyzers, built by the pool initializer
+_worker_analyzers = {}
+
+
+def _init_worker(opencv_threads, analysis_options):
+    from models.crop_health_analyzer import CropHealthAnalyzer
+    from models.disease_detector import DiseaseDetector
+
+    cv2.setNumThreads(opencv_threads)
+    _worker_analyzers['health'] = CropHealthAnalyzer(**analysis_options)
+    # Heuristic tier only: the CNN stays in the serving process with its batcher
+    _worker_analyzers['disease'] = DiseaseDetector(**analysis_options)
+
+
+def _ping():
+    return os.getpid()
+
+
+def _run_on_shared_image(task, shm_name, shape, dtype, args):
+    """
+    Attach to the parent's shared memory block and run an analysis on it (no pixel copy).
+    Returns (result, stage timings) so the parent can record the timings under its route.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        image = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        with metrics.collect() as timings:
+            if task == 'health':
+                result = _worker_analyzers['health'].analyze_image(image, *args)
+            else:
+                result = _worker_analyzers['disease'].analyze_disease_indicators(image)
+        # Drop every view of the buffer before closing it
+        del image
+        return result, timings
+    finally:
+        shm.close()
+
+
+class AnalysisPool:
+    """
+    Runs the OpenCV-heavy heuristic analysis in worker processes, so the disease
+    and health pipelines use every core instead of contending for the GIL.
+    Decoded images are copied once into a shared memory block; workers map it
+    directly rather than receiving pickled pixel arrays.
+    Pool size x OpenCV threads per worker should not exceed the core count.
+    A worker that dies (OOM, a crash inside OpenCV) breaks the executor; it is
+    rebuilt and the task retried once, so later requests are not affected.
+    """
+
+    def __init__(self, processes, opencv_threads=1, analysis_max_side=None, tile_rows=None, task_timeout=60):
+        self.processes = max(1, int(processes))
+        self.opencv_threads = max(1, int(opencv_threads))
+        self.task_timeout = task_timeout
+        self.analysis_options = {'analysis_max_side': analysis_max_side, 'tile_rows': tile_rows}
+        # Fork the workers up front (before the server starts its threads); where
+        # fork is unavailable the spawned workers re-import the entry module
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else 'spawn')
+        # Workers must share our resource tracker, or each one would report the
+        # blocks it attached to as leaked
+        resource_tracker.ensure_running()
+        self.executor = self._make_executor(context)
+
+        self._lock = threading.Lock()
+        self.tasks = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.restarts = 0
+
+    def _make_executor(self, context):
+        return ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self.opencv_threads, self.analysis_options)
+        )
+
+    def _restart(self, broken):
+        """Replace a broken executor (once, however many requests saw it break)"""
+        with self._lock:
+            if self.executor is not broken:
+                return
+            # The server's threads are running by now: forking could copy a held lock,
+            # so replacement workers come from a forkserver where available
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            self.executor = self._make_executor(context)
+            self.restarts += 1
+        print(f"⚠️ Analysis worker died, restarted the pool ({self.restarts} restart(s) so far)")
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def warm_up(self):
+        """Start every worker process now rather than on the first request"""
+        for future in [self.executor.submit(_ping) for _ in range(self.processes)]:
+            future.result()
+
+    def run(self, task, image, *args):
+        """Run `task` ('health' or 'disease') on a decoded image in a worker process"""
+        image = np.ascontiguousarray(image)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, image.nbytes))
+        with self._lock:
+            self.tasks += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            shared = np.ndarray(image.shape, dtype=image.dtype, buffer=shm.buf)
+            shared[...] = image
+            del shared
+            call = (_run_on_shared_image, task, shm.name, image.shape, image.dtype.str, args)
+            try:
+                result, timings = self._submit(call)
+            except BrokenProcessPool:
+                # Retried once on the rebuilt pool; an image that kills workers fails the second time
+                result, timings = self._submit(call)
+            for stage_name, seconds in timings.items():
+                metrics.record(stage_name, seconds)
+            return result
+        except FutureTimeoutError:
+            with self._lock:
+                self.failures += 1
+                self.timeouts += 1
+            raise TimeoutError(f"Image analysis took longer than {self.task_timeout}s")
+        except Exception:
+            with self._lock:
+                self.failures += 1
+            raise
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            shm.close()
+            shm.unlink()
+
+    def _submit(self, call):
+        executor = self.executor
+        try:
+            return executor.submit(*call).result(self.task_timeout)
+        except BrokenProcessPool:
+            self._restart(executor)
+            raise
+
+    def analyze_health(self, image, crop_type='unknown'):
+        return self.run('health', image, crop_type)
+
+    def disease_indicators(self, image):
+        return self.run('disease', image)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'processes': self.processes,
+                'opencvThreads': self.opencv_threads,
+                'tasks': self.tasks,
+                'inFlight': self.in_flight,
+                'peakInFlight': self.peak_in_flight,
+                'failures': self.failures,
+                'timeouts': self.timeouts,
+                'restarts': self.restarts
+            }
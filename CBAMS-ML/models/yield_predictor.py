@@ -1,92 +1,147 @@
 import numpy as np
 import pandas as pd
-import pickle
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split
 import os
+import threading
+from datetime import datetime
+
+from models.model_store import load_model, save_model, as_backend, fit_parallel
+from models.dataset_store import dataset_exists, write_generated
+from models.incremental import incremental_update, load_checkpoint, read_dataset, save_checkpoint, saved_forest_params
+from models.result_cache import QuantizedPredictionCache
+from models import synthetic_data
+from models.metrics import stage
 
 class YieldPredictor:
-    def __init__(self):
+    DATASET_PATH = 'datasets/yield_data.csv'
+    MODEL_PATH = 'trained_models/yield_model'
+    # Cache key rounding per feature: N, P, K, temperature, rainfall, area
+    CACHE_RESOLUTIONS = [1, 1, 1, 0.1, 1, 0.01]
+    # Forest hyperparameters for full training (train_forests.py sweeps alternatives)
+    # RandomForestRegressor as a robust alternative to XGBoost for this scale
+    FOREST_PARAMS = {'n_estimators': 150, 'random_state': 42}
+    TEST_SIZE = 0.15
+    
+    def __init__(self, backend=None, cache_size=4096, cache_resolutions=None, load=True):
         self.model = None
-        self.load_or_train_model()
+        self.backend = backend  # 'sklearn', 'flat' or 'hybrid' (see models/model_store.py)
+        self._train_lock = threading.RLock()
+        # Memoized predictions on quantized inputs (cache_size=0 disables)
+        self.cache = None
+        if cache_size:
+            self.cache = QuantizedPredictionCache(cache_resolutions or self.CACHE_RESOLUTIONS, cache_size)
+        # load=False leaves the model unset, e.g. for a caller that trains a new one
+        if load:
+            self.load_or_train_model()
     
     def load_or_train_model(self):
-        model_path = 'trained_models/yield_model.pkl'
-        if os.path.exists(model_path):
-            with open(model_path, 'rb') as f:
-                self.model = pickle.load(f)
+        self.model = load_model(self.MODEL_PATH, self.backend)
+        if self.model is not None:
             print("✅ Loaded existing yield prediction model")
         else:
             print("⚠️ No yield model found. Training new model...")
             self.train_model()
             
-    def train_model(self):
-        """Train crop yield prediction model"""
-        dataset_path = 'datasets/yield_data.csv'
+    @classmethod
+    def forest_params(cls):
+        """FOREST_PARAMS, overridden by the parameters the saved model was trained with"""
+        return saved_forest_params(cls.MODEL_PATH, cls.FOREST_PARAMS)
+    
+    @classmethod
+    def load_training_data(cls):
+        """
+        Read the yield dataset (generating it first if missing) and split it for training.
+        Returns ((X_train, X_test, y_train, y_test), checkpoint).
+        """
+        dataset_path = cls.DATASET_PATH
         
-        if os.path.exists(dataset_path):
+        if dataset_exists(dataset_path):
             print(f"📁 Loading yield dataset from {dataset_path}...")
-            data = pd.read_csv(dataset_path)
         else:
             print("⚠️ No yield dataset found. Generating initial dataset...")
-            data = self.generate_mock_data()
-            os.makedirs('datasets', exist_ok=True)
-            data.to_csv(dataset_path, index=False)
-            print(f"✅ Created new yield dataset file at {dataset_path}")
-            
-        # Prepare features: N, P, K, temp, hum, ph, rain, area
+            cls.create_dataset()
+        # Read back through the checkpointed reader: appended rows are picked up incrementally later
+        data, checkpoint = read_dataset(dataset_path, 'yield')
+        
+        # Prepare features: N, P, K, temp, rain, area
         X = data.drop('yield', axis=1)
         y = data['yield']
         
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.15, random_state=42
-        )
-        
-        # Using RandomForestRegressor as a robust alternative to XGBoost for this scale
-        self.model = RandomForestRegressor(n_estimators=150, random_state=42)
-        self.model.fit(X_train, y_train)
-        
-        score = self.model.score(X_test, y_test)
-        print(f"✅ Yield Model trained. R^2 Score: {score:.4f}")
-        
-        os.makedirs('trained_models', exist_ok=True)
-        model_path = 'trained_models/yield_model.pkl'
-        with open(model_path, 'wb') as f:
-            pickle.dump(self.model, f)
+        split = train_test_split(X, y, test_size=cls.TEST_SIZE, random_state=42)
+        return split, checkpoint
             
-    def generate_mock_data(self):
-        """Generate synthetic yield data based on area and environmental factors"""
-        np.random.seed(42)
-        n_samples = 1500
+    def train_model(self, params=None, n_jobs=None):
+        """
+        Train crop yield prediction model.
+        params overrides forest_params() and is saved with the model, so later
+        full retrains keep it; trees are fitted on n_jobs cores (default ML_TRAIN_JOBS).
+        """
+        with self._train_lock:
+            (X_train, X_test, y_train, y_test), checkpoint = self.load_training_data()
         
-        # Factors influencing yield
-        N = np.random.uniform(20, 120, n_samples)
-        P = np.random.uniform(20, 100, n_samples)
-        K = np.random.uniform(10, 200, n_samples)
-        temp = np.random.uniform(15, 40, n_samples)
-        rain = np.random.uniform(50, 250, n_samples)
-        area = np.random.uniform(1, 50, n_samples) # hectares
+            params = {**self.forest_params(), **(params or {})}
+            model = RandomForestRegressor(**params)
+            fit_parallel(model, X_train, y_train, n_jobs)
         
-        # Yield formula (simplified logic: Yield = Area * BaseRate * Factors)
-        # Base rate 2-6 tonnes per hectare
-        base_rate = np.random.uniform(2, 6, n_samples)
+            score = model.score(X_test, y_test)
+            print(f"✅ Yield Model trained. R^2 Score: {score:.4f}")
         
-        # Environmental impact factors (0.8 to 1.2)
-        nutrient_factor = (N/80 + P/60 + K/100) / 3
-        weather_factor = (temp/25 + rain/150) / 2
+            save_model(model, self.MODEL_PATH)
+            checkpoint.update(baseRows=checkpoint['rows'], baseEstimators=model.n_estimators,
+                              nEstimators=model.n_estimators, forestParams=params,
+                              updatedAt=datetime.now().isoformat())
+            save_checkpoint(self.MODEL_PATH, checkpoint)
+            self.model = as_backend(model, self.MODEL_PATH, self.backend)
         
-        yield_tonnes = area * base_rate * (nutrient_factor * 0.4 + weather_factor * 0.6)
-        # Add some noise
-        yield_tonnes += np.random.normal(0, yield_tonnes * 0.05)
-        
-        return pd.DataFrame({
-            'N': N, 'P': P, 'K': K,
-            'temperature': temp, 'rainfall': rain, 'area': area,
-            'yield': yield_tonnes
-        })
+            # Cached predictions came from the previous model
+            if self.cache:
+                self.cache.invalidate()
+
+    def train_incremental(self, min_rows=10):
+        """
+        Grow the forest with rows appended to the dataset since the last training,
+        then swap it in. Falls back to a full retrain when the dataset was rewritten,
+        has new labels, or the forest has grown too large.
+        """
+        with self._train_lock:
+            update = incremental_update(self.MODEL_PATH, self.DATASET_PATH, 'yield', min_rows)
+            if update['status'] == 'retrain':
+                print(f"🔁 Full yield retrain: {update['reason']}")
+                self.train_model()
+                return {'status': 'retrained', 'reason': update['reason'], 'rows': load_checkpoint(self.MODEL_PATH)['rows']}
+            
+            if update['status'] == 'updated':
+                model = update.pop('model')
+                # Artifacts first, then the checkpoint (a crash in between leaves mismatched tree counts -> full retrain)
+                save_model(model, self.MODEL_PATH)
+                save_checkpoint(self.MODEL_PATH, update.pop('checkpoint'))
+                # Requests already running finish on the model they started with
+                self.model = as_backend(model, self.MODEL_PATH, self.backend)
+                if self.cache:
+                    self.cache.invalidate()
+                print(f"✅ Yield model grew by {update['addedEstimators']} trees from {update['newRows']} new rows")
+            return update
+    
+    @classmethod
+    def create_dataset(cls, fmt=None):
+        """Generate the initial yield dataset, written straight to fmt (default ML_DATASET_FORMAT)"""
+        os.makedirs('datasets', exist_ok=True)
+        path = write_generated([cls.generate_mock_data()], cls.DATASET_PATH, fmt)
+        print(f"✅ Created new yield dataset file at {path}")
+        return path
+    
+    @staticmethod
+    def generate_mock_data(n_samples=1500, seed=42):
+        """Generate synthetic yield data based on area and environmental factors"""
+        return synthetic_data.generate('yield', n_samples, seed=seed)
 
     def predict(self, input_data):
-        if self.model is None:
+        # Cache generation before the model: if a retrain swaps the model in meanwhile,
+        # the value computed with this one is not cached
+        generation = self.cache.generation if self.cache else None
+        model = self.model
+        if model is None:
             raise Exception("Yield model not loaded")
             
         features = np.array([[
@@ -98,7 +153,8 @@ class YieldPredictor:
             float(input_data.get('area', 1))
         ]])
         
-        prediction = self.model.predict(features)[0]
+        with stage('forest_predict'):
+            prediction = self.predict_value(model, features, generation)
         
         # Return structured results
         return {
@@ -111,3 +167,18 @@ class YieldPredictor:
                 'weatherImpact': 'Optimal' if 20 < float(input_data.get('temperature', 25)) < 30 else 'Sub-optimal'
             }
         }
+    
+    def predict_value(self, model, features, generation=None):
+        """
+        Single-row prediction through the quantized-input cache.
+        generation: cache generation read before `model` (stale values are not stored)
+        """
+        if self.cache is None or not self.cache.cacheable(features):
+            return model.predict(features)[0]
+        
+        keys, snapped = self.cache.quantize(features)
+        prediction = self.cache.get(keys[0])
+        if prediction is None:
+            prediction = float(model.predict(snapped)[0])
+            self.cache.put(keys[0], prediction, size=64, generation=generation)
+        return prediction
@@ -1,3 +1,4 @@
+import argparse
 import os
 import sys
 
@@ -6,14 +7,40 @@ sys.path.append(os.getcwd())
 
 from models.crop_recommendation import CropRecommendationModel
 from models.yield_predictor import YieldPredictor
+from models.dataset_store import DEFAULT_FORMAT, convert_dataset, dataset_exists
+
+parser = argparse.ArgumentParser(description="Generate datasets and (re)train the forest models")
+parser.add_argument('--incremental', action='store_true',
+                    help="Only train on rows appended since the last checkpoint (full retrain if needed)")
+parser.add_argument('--min-rows', type=int, default=10, help="Minimum new rows for an incremental update")
+parser.add_argument('--format', choices=['parquet', 'feather'], default=DEFAULT_FORMAT,
+                    help="Columnar format datasets are generated in / converted to (default ML_DATASET_FORMAT)")
+parser.add_argument('--csv', action='store_true',
+                    help="Generate missing datasets as CSV (needed to append rows for incremental training)")
+args = parser.parse_args()
 
 print("🚀 Initializing datasets and models...")
 
-# This will trigger the train_model() method which now saves CSVs
-recommender = CropRecommendationModel()
-recommender.train_model()  # Force generate CSV and retrain
+# Models are trained below, not loaded
+recommender = CropRecommendationModel(load=False)
+yield_predictor = YieldPredictor(load=False)
 
-yield_predictor = YieldPredictor()
-yield_predictor.train_model() # Force generate CSV and retrain
+if args.incremental:
+    for name, model in (('Crop recommendation', recommender), ('Yield', yield_predictor)):
+        result = model.train_incremental(min_rows=args.min_rows)
+        detail = result.get('reason') or f"{result.get('newRows', 0)} new rows"
+        print(f"📈 {name}: {result['status']} ({detail}, {result['rows']} rows total)")
+else:
+    for model, target in ((recommender, 'label'), (yield_predictor, 'yield')):
+        if not dataset_exists(model.DATASET_PATH):
+            # Written straight to the columnar format: no CSV to write and parse back
+            model.create_dataset('csv' if args.csv else args.format)
+        if os.path.exists(model.DATASET_PATH):
+            # Columnar copy of an existing CSV (converted in chunks, skipped if up to date)
+            path = convert_dataset(model.DATASET_PATH, target, args.format)
+            if path:
+                print(f"🗜️ {model.DATASET_PATH} -> {path}")
+    recommender.train_model()
+    yield_predictor.train_model()
 
-print("\n✨ Done! Check the 'datasets' folder for the new CSV files.")
+print("\n✨ Done! Check the 'datasets' folder for the dataset files.")
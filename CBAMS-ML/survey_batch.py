@@ -0,0 +1,235 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Add the current directory and models directory to path
+sys.path.append(os.getcwd())
+
+from models.crop_health_analyzer import CropHealthAnalyzer
+from models.disease_detector import DiseaseDetector
+from models.image_utils import decode_image
+from models.worker_pool import AnalysisPool
+
+# Bulk field-survey analysis: streams a directory or zip of leaf photos through
+# decoding, heuristic analysis and (optional) CNN inference, writing one result
+# per image as it completes. Re-running with --resume skips finished images.
+#
+#   python survey_batch.py survey_2024_07.zip --output survey.jsonl --crop-type rice
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+CSV_FIELDS = ['file', 'status', 'disease', 'diseaseDetected', 'confidence', 'severity',
+              'healthScore', 'healthStatus', 'healthy_percent', 'stressed_percent',
+              'diseased_percent', 'error', 'processedAt']
+
+
+def iter_images(source):
+    """Yield (name, read_bytes) for every image in a directory tree or zip archive, in a stable order"""
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                    yield info.filename, lambda info=info: archive.read(info)
+        return
+
+    for root, dirs, files in os.walk(source):
+        dirs.sort()
+        for filename in sorted(files):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, source).replace(os.sep, '/')
+                yield name, lambda path=path: open(path, 'rb').read()
+
+
+class ResultWriter:
+    """Appends results as JSONL (full detail) or CSV (summary columns), flushing every row"""
+
+    def __init__(self, path, fmt, retry_errors=False):
+        self.path = path
+        self.format = fmt
+        self.done = self.load_finished(retry_errors) if os.path.exists(path) else set()
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, 'a', newline='')
+        self.csv = csv.DictWriter(self.file, CSV_FIELDS, extrasaction='ignore') if fmt == 'csv' else None
+        if self.csv and new_file:
+            self.csv.writeheader()
+
+    def load_finished(self, retry_errors):
+        """
+        Names already in the output. A partially written last record is cut off; with
+        retry_errors, failed rows are dropped so each retried image keeps one row.
+        """
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        header, records = self.read_records(data)
+        keep = [(raw, row) for raw, row in records if not (retry_errors and row.get('status') == 'error')]
+
+        content = header + b''.join(raw for raw, _ in keep)
+        if content != data:
+            tmp_path = f'{self.path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, self.path)
+        return {row['file'] for _, row in keep}
+
+    def read_records(self, data):
+        """(header bytes, [(raw bytes, row)]) for every complete record in the output"""
+        lines = data.splitlines(keepends=True)
+        if self.format != 'csv':
+            # JSON escapes newlines: a record is complete once its line end is written
+            return b'', [(line, json.loads(line)) for line in lines if line.endswith(b'\n') and line.strip()]
+
+        # Quoted fields may span lines: let csv.reader find the record boundaries
+        consumed = []
+
+        def feed():
+            for line in lines:
+                consumed.append(line)
+                yield line.decode('utf-8')
+
+        header, fields, records = b'', None, []
+        try:
+            for values in csv.reader(feed(), strict=True):
+                raw = b''.join(consumed)
+                consumed.clear()
+                if not raw.endswith(b'\n'):
+                    break  # last record written without its line end
+                if fields is None:
+                    header, fields = raw, values
+                elif values:
+                    records.append((raw, dict(zip(fields, values))))
+        except csv.Error:
+            pass  # cut off inside a quoted field
+        return header, records
+
+    def write(self, result):
+        if self.csv:
+            self.csv.writerow(summarize(result))
+        else:
+            self.file.write(json.dumps(result) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def summarize(result):
+    """Flat CSV row for a result"""
+    row = {key: result.get(key) for key in ('file', 'status', 'error', 'processedAt')}
+    detection = result.get('detection')
+    if detection:
+        row.update({
+            'disease': detection['disease']['name'],
+            'diseaseDetected': detection['diseaseDetected'],
+            'confidence': detection.get('confidence'),
+            'severity': detection.get('severity', {}).get('level')
+        })
+    health = result.get('health')
+    if health:
+        row.update({'healthScore': health['healthScore'], 'healthStatus': health['status'], **health['metrics']})
+    return row
+
+
+def analyze(name, data, detector, analyzer, crop_type):
+    """Decode once, then run the requested pipelines on the shared array"""
+    result = {'file': name, 'status': 'ok'}
+    try:
+        image = decode_image(data)
+        if detector:
+            detection = detector.detect(image)
+            if 'error' in detection:
+                raise Exception(detection['error'])
+            result['detection'] = detection
+        if analyzer:
+            result['health'] = analyzer.analyze_image(image, crop_type)
+    except Exception as e:
+        result = {'file': name, 'status': 'error', 'error': str(e)}
+    result['processedAt'] = datetime.now().isoformat()
+    return result
+
+
+parser = argparse.ArgumentParser(description="Analyze a directory or zip of field-survey leaf photos")
+parser.add_argument('source', help="Directory of images or a .zip archive")
+parser.add_argument('--output', required=True, help="Results file (.jsonl or .csv)")
+parser.add_argument('--format', choices=['jsonl', 'csv'], help="Defaults to the output file extension")
+parser.add_argument('--tasks', nargs='+', choices=['disease', 'health'], default=['disease', 'health'])
+parser.add_argument('--crop-type', default='unknown')
+parser.add_argument('--resume', action='store_true', help="Skip images already in the output file")
+parser.add_argument('--retry-errors', action='store_true', help="With --resume, re-run images that failed")
+parser.add_argument('--workers', type=int, default=os.cpu_count() or 4, help="Images analyzed concurrently")
+parser.add_argument('--window', type=int, default=0, help="Max images in memory (default 2 x workers)")
+parser.add_argument('--processes', type=int, default=0, help="Heuristic analysis worker processes (0 = threads only)")
+parser.add_argument('--model-path', default=os.environ.get('ML_DISEASE_MODEL_PATH'), help="Optional CNN model")
+parser.add_argument('--cnn-backend', choices=['keras', 'tflite'], default=None, help="Default ML_CNN_BACKEND")
+parser.add_argument('--cnn-threads', type=int, default=0, help="TFLite interpreter threads (0 = interpreter default)")
+parser.add_argument('--max-side', type=int, default=0, help="Analysis resolution (longest side, 0 = full)")
+parser.add_argument('--tile-rows', type=int, default=0, help="Strip height for tiled analysis (0 = off)")
+parser.add_argument('--cascade', action='store_true', help="Skip the full disease pipeline for clearly healthy leaves")
+args = parser.parse_args()
+
+fmt = args.format or ('csv' if args.output.lower().endswith('.csv') else 'jsonl')
+if os.path.exists(args.output) and os.path.getsize(args.output) and not args.resume:
+    print(f"❌ {args.output} already exists; pass --resume to continue it")
+    sys.exit(1)
+
+analysis_options = {'analysis_max_side': args.max_side or None, 'tile_rows': args.tile_rows or None}
+pool = None
+if args.processes:
+    pool = AnalysisPool(args.processes, max(1, (os.cpu_count() or 1) // args.processes), **analysis_options)
+    pool.warm_up()
+# Concurrent CNN calls from the workers are micro-batched into one model call
+detector = DiseaseDetector(args.model_path, cnn_batch_size=args.workers, analysis_pool=pool,
+                           cnn_backend=args.cnn_backend, cnn_threads=args.cnn_threads or None,
+                           cascade=args.cascade, **analysis_options) if 'disease' in args.tasks else None
+analyzer = CropHealthAnalyzer(analysis_pool=pool, **analysis_options) if 'health' in args.tasks else None
+
+writer = ResultWriter(args.output, fmt, retry_errors=args.retry_errors)
+if writer.done:
+    print(f"⏩ Resuming: {len(writer.done)} image(s) already processed")
+
+window = args.window or args.workers * 2
+in_flight = deque()
+processed = failed = 0
+started = time.perf_counter()
+
+
+def drain(limit):
+    """Write finished results in input order until at most `limit` remain in flight"""
+    global processed, failed
+    while len(in_flight) > limit:
+        result = in_flight.popleft().result()
+        writer.write(result)
+        processed += 1
+        failed += result['status'] == 'error'
+        if processed % 50 == 0:
+            rate = processed / (time.perf_counter() - started)
+            print(f"   {processed} images ({rate:.1f}/s), {failed} failed")
+
+
+print(f"🔬 Analyzing {args.source} ({', '.join(args.tasks)}) with {args.workers} workers...")
+with ThreadPoolExecutor(max_workers=args.workers) as executor:
+    for name, read_bytes in iter_images(args.source):
+        if name in writer.done:
+            continue
+        # Bounded window: at most `window` images are read but not yet written
+        drain(window - 1)
+        # Bytes are read here, sequentially (zip archives are not read concurrently)
+        in_flight.append(executor.submit(analyze, name, read_bytes(), detector, analyzer, args.crop_type))
+    drain(0)
+
+writer.close()
+if pool:
+    pool.shutdown()
+
+elapsed = time.perf_counter() - started
+print(f"\n✨ Done: {processed} image(s) in {elapsed:.1f}s, {failed} failed. Results in {args.output}")
+if detector and args.cascade:
+    cascade = detector.cascade_stats()
+    print(f"⏩ Cascade: {cascade['earlyExits']} of {cascade['screened']} image(s) exited early, "
+          f"escalated by {cascade['escalatedBy']}")
@@ -0,0 +1,194 @@
+import argparse
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+
+# Add the current directory and models directory to path
+sys.path.append(os.getcwd())
+
+from models.crop_recommendation import CropRecommendationModel
+from models.model_store import artifact_paths, fit_parallel, load_model, save_model
+from models.yield_predictor import YieldPredictor
+
+# Hyperparameter sweep for the forest models. Configurations are fitted in
+# worker processes (each fit using its share of the cores), then timed one at a
+# time in this process so concurrent fits don't skew the latencies.
+#
+#   python train_forests.py --model crop --n-estimators 25 50 100 --max-depth none 12 20 \
+#       --min-score 0.97 --save-best
+
+MODELS = {
+    'crop': (CropRecommendationModel, RandomForestClassifier),
+    'yield': (YieldPredictor, RandomForestRegressor)
+}
+
+_split = None  # (X_train, X_test, y_train, y_test) in each worker process
+
+
+def parse_optional(value, cast):
+    """'none' -> None, otherwise cast(value)"""
+    return None if value.lower() == 'none' else cast(value)
+
+
+def parse_max_features(value):
+    try:
+        return float(value) if '.' in value else int(value)
+    except ValueError:
+        return parse_optional(value, str)  # 'sqrt', 'log2' or none
+
+
+def build_grid(args, defaults):
+    """Cartesian product of the swept values; unswept parameters keep the model's defaults"""
+    swept = {
+        'n_estimators': args.n_estimators,
+        'max_depth': args.max_depth,
+        'min_samples_leaf': args.min_samples_leaf,
+        'max_features': args.max_features
+    }
+    swept = {name: values for name, values in swept.items() if values}
+    grid = []
+    for combination in itertools.product(*swept.values()):
+        grid.append({**defaults, **dict(zip(swept, combination))})
+    return grid or [dict(defaults)]
+
+
+def init_worker(split):
+    global _split
+    _split = split
+
+
+def fit_config(index, estimator_class, params, n_jobs, workdir):
+    """Fit one configuration, score it and save its artifacts under workdir"""
+    X_train, X_test, y_train, y_test = _split
+    model = estimator_class(**params)
+    start = time.perf_counter()
+    fit_parallel(model, X_train, y_train, n_jobs)
+    fit_seconds = time.perf_counter() - start
+
+    base_path = os.path.join(workdir, f'config_{index}')
+    save_model(model, base_path)
+    paths = artifact_paths(base_path)
+    flat_bytes = sum(entry.stat().st_size for entry in os.scandir(paths['flat']) if entry.is_file())
+    return {
+        'index': index,
+        'params': params,
+        'score': float(model.score(X_test, y_test)),
+        'fitSeconds': round(fit_seconds, 3),
+        'nodes': int(sum(estimator.tree_.node_count for estimator in model.estimators_)),
+        'joblibBytes': os.path.getsize(paths['joblib']),
+        'flatBytes': flat_bytes,
+        'basePath': base_path
+    }
+
+
+def time_calls(fn, X, repeats):
+    """p50/p99 latency in milliseconds of fn(X)"""
+    fn(X)  # warm-up
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(X)
+        samples.append((time.perf_counter() - start) * 1000)
+    return float(np.percentile(samples, 50)), float(np.percentile(samples, 99))
+
+
+def measure_latency(result, X_test, backend, batch_size, repeats, rng):
+    """Single-row and batch inference latency of a saved configuration, as served by `backend`"""
+    model = load_model(result['basePath'], backend)
+    method = model.predict_proba if hasattr(model, 'classes_') else model.predict
+    # Requests arrive as plain arrays (see build_features)
+    rows = np.asarray(X_test, dtype=np.float64)
+    single = rows[:1]
+    batch = rows[rng.integers(0, len(rows), batch_size)]
+    result['singleP50Ms'], result['singleP99Ms'] = time_calls(method, single, repeats)
+    result['batchP50Ms'], result['batchP99Ms'] = time_calls(method, batch, max(5, repeats // 10))
+
+
+parser = argparse.ArgumentParser(description="Train the forest models in parallel and sweep their hyperparameters")
+parser.add_argument('--model', choices=['crop', 'yield', 'all'], default='all')
+parser.add_argument('--n-estimators', type=int, nargs='+', help="Tree counts to try")
+parser.add_argument('--max-depth', type=lambda v: parse_optional(v, int), nargs='+', help="Depths to try ('none' = unlimited)")
+parser.add_argument('--min-samples-leaf', type=int, nargs='+')
+parser.add_argument('--max-features', type=parse_max_features, nargs='+', help="e.g. sqrt log2 0.5 none")
+parser.add_argument('--processes', type=int, default=0, help="Configurations fitted at once (0 = one per core, capped by grid size)")
+parser.add_argument('--backend', choices=['sklearn', 'flat', 'hybrid'], default=None,
+                    help="Inference backend to time (default ML_FOREST_BACKEND)")
+parser.add_argument('--batch-size', type=int, default=1000, help="Rows per batch-latency call")
+parser.add_argument('--repeats', type=int, default=200, help="Timed single-row calls per configuration")
+parser.add_argument('--min-score', type=float, default=None, help="Accuracy (crop) / R^2 (yield) floor for picking a configuration")
+parser.add_argument('--rank-by', choices=['single', 'batch', 'size'], default='single',
+                    help="Cost used to pick the cheapest configuration meeting --min-score")
+parser.add_argument('--save-best', action='store_true', help="Retrain the picked configuration on all cores and save it as the live model")
+parser.add_argument('--output', help="Write all results as JSON")
+args = parser.parse_args()
+
+cost_keys = {'single': 'singleP50Ms', 'batch': 'batchP50Ms', 'size': 'joblibBytes'}
+report = {'startedAt': datetime.now().isoformat(), 'models': {}}
+rng = np.random.default_rng(0)
+
+for name, (model_class, estimator_class) in MODELS.items():
+    if args.model not in ('all', name):
+        continue
+
+    # Same data and split as a full training run
+    split, _ = model_class.load_training_data()
+    # Unswept parameters keep the live model's (possibly tuned) values
+    grid = build_grid(args, model_class.forest_params())
+    processes = min(args.processes or os.cpu_count() or 1, len(grid))
+    n_jobs = max(1, (os.cpu_count() or 1) // processes)
+    print(f"\n🌲 {name}: {len(grid)} configuration(s), {processes} process(es) x {n_jobs} core(s)")
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix=f'sweep_{name}_') as workdir:
+        with ProcessPoolExecutor(max_workers=processes, initializer=init_worker, initargs=(split,)) as pool:
+            futures = [pool.submit(fit_config, i, estimator_class, params, n_jobs, workdir) for i, params in enumerate(grid)]
+            for future in as_completed(futures):
+                result = future.result()
+                print(f"   fitted {result['params']} in {result['fitSeconds']:.1f}s")
+                results.append(result)
+
+        with warnings.catch_warnings():
+            # Models were fitted on DataFrames; requests are served from plain arrays
+            warnings.filterwarnings('ignore', message='X does not have valid feature names')
+            for result in sorted(results, key=lambda r: r['index']):
+                measure_latency(result, split[1], args.backend, args.batch_size, args.repeats, rng)
+                del result['basePath']
+
+    results.sort(key=lambda r: r['index'])
+    metric = 'accuracy' if name == 'crop' else 'R^2'
+    print(f"\n{'#':>3} {'n_est':>6} {'depth':>6} {'leaf':>5} {'feat':>6} {metric:>9} {'joblib':>9} {'flat':>9} "
+          f"{'1-row p50':>10} {'p99':>8} {f'{args.batch_size}-row p50':>13} {'fit':>7}")
+    for r in results:
+        p = r['params']
+        print(f"{r['index']:>3} {p.get('n_estimators', 100):>6} {str(p.get('max_depth')):>6} {p.get('min_samples_leaf', 1):>5} "
+              f"{str(p.get('max_features', 'default')):>6} {r['score']:>9.4f} {r['joblibBytes'] / 1e6:>7.2f}MB "
+              f"{r['flatBytes'] / 1e6:>7.2f}MB {r['singleP50Ms']:>8.3f}ms {r['singleP99Ms']:>6.3f}ms "
+              f"{r['batchP50Ms']:>11.2f}ms {r['fitSeconds']:>6.1f}s")
+
+    eligible = [r for r in results if args.min_score is None or r['score'] >= args.min_score]
+    best = min(eligible, key=lambda r: (r[cost_keys[args.rank_by]], -r['score'])) if eligible else None
+    if best is None:
+        print(f"⚠️ No {name} configuration reaches {metric} {args.min_score}")
+    else:
+        print(f"🏆 Cheapest {name} configuration by {args.rank_by}"
+              f"{f' with {metric} >= {args.min_score}' if args.min_score is not None else ''}: #{best['index']} {best['params']}")
+    report['models'][name] = {'metric': metric, 'results': results, 'best': best and best['index']}
+
+    if args.save_best and best is not None:
+        print(f"💾 Retraining #{best['index']} on all cores and saving it as the {name} model...")
+        # Its params are saved in the checkpoint, so later full retrains keep them
+        model_class(cache_size=0, load=False).train_model(params=best['params'])
+
+if args.output:
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✨ Results written to {args.output}")
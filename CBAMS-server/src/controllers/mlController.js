@@ -218,10 +218,64 @@ export const getPriceForecast = async (req, res) => {
     res.json(response.data);
   } catch (error) {
     console.error('❌ Price Forecast Error:', error.message);
+    // Invalid requests rejected by the ML service keep their status and message
+    const status = error.response?.status;
+    if (status >= 400 && status < 500) {
+      return res.status(status).json(error.response.data);
+    }
     res.status(500).json({ error: 'Failed to get price forecast' });
   }
 };
 
+// ========== BULK MARKET PRICE FORECAST ==========
+// Forecast horizon limits, matching the ML service
+const MAX_FORECAST_WEEKS = 52;
+const MAX_FORECAST_MONTHS = 12;
+
+// Optional query value as an integer in 1..max; null when present but invalid
+const parseHorizon = (value, max) => {
+  if (value === undefined) return undefined;
+  if (typeof value !== 'string' || !/^\d+$/.test(value)) return null;
+  const number = Number(value);
+  return number >= 1 && number <= max ? number : null;
+};
+
+export const getBulkPriceForecast = async (req, res) => {
+  try {
+    // e.g., ?crops=Rice,Wheat&weeks=8&bestTime=true (omit crops for every crop)
+    const { crops, weeks, months, bestTime } = req.query;
+
+    if (crops !== undefined && typeof crops !== 'string') {
+      return res.status(400).json({ error: 'crops must be a comma-separated list' });
+    }
+    const weekCount = parseHorizon(weeks, MAX_FORECAST_WEEKS);
+    const monthCount = parseHorizon(months, MAX_FORECAST_MONTHS);
+    if (weekCount === null || monthCount === null) {
+      return res.status(400).json({
+        error: `weeks must be 1-${MAX_FORECAST_WEEKS} and months 1-${MAX_FORECAST_MONTHS}`
+      });
+    }
+
+    // One call to the ML service instead of one per crop
+    const response = await axios.post(`${ML_SERVICE_URL}/predict-price/bulk`, {
+      crops: crops ? crops.split(',').map((crop) => crop.trim()).filter(Boolean) : undefined,
+      weeks: weekCount,
+      months: monthCount,
+      includeBestTime: bestTime === 'true'
+    });
+
+    res.json(response.data);
+  } catch (error) {
+    console.error('❌ Bulk Price Forecast Error:', error.message);
+    // Invalid requests rejected by the ML service keep their status and message
+    const status = error.response?.status;
+    if (status >= 400 && status < 500) {
+      return res.status(status).json(error.response.data);
+    }
+    res.status(500).json({ error: 'Failed to get price forecasts' });
+  }
+};
+
 // ========== GET CROP PROGRESS ==========
 export const getCropProgress = async (req, res) => {
   try {
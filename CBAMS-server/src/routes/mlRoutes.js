@@ -2,6 +2,7 @@ import express from 'express';
 import {
   getYieldPrediction,
   getPriceForecast,
+  getBulkPriceForecast,
   detectDisease
 } from '../controllers/mlController.js';
 import { upload } from '../config/cloudinary.js';
@@ -18,6 +19,9 @@ router.post('/yield', getYieldPrediction);
 // Get price forecast
 router.get('/price', getPriceForecast);
 
+// Get price forecasts for many crops in one call
+router.get('/price/bulk', getBulkPriceForecast);
+
 // Detect disease from image
 router.post('/detect-disease', upload.single('image'), detectDisease);
 